@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'user_login',
@@ -82,6 +83,59 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'work_dir', 'backend', 'cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '100000')),
+        },
+    },
+    # Счётчики поколений держим отдельно: вытеснение фрагментов и ответов
+    # из основного кэша не должно сбрасывать их.
+    'generations': {
+        'BACKEND': os.getenv(
+            'GENERATION_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv(
+            'GENERATION_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'work_dir', 'backend', 'generations')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.getenv('GENERATION_CACHE_MAX_ENTRIES', '1000000')),
+        },
+    },
+}
+
+
+INGREDIENT_SIMILARITY_THRESHOLD = float(
+    os.getenv('INGREDIENT_SIMILARITY_THRESHOLD', '0.3'))
+
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '2'))
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', str(10 * 1024 * 1024)))
+
+CHUNKED_UPLOAD_DIR = os.getenv(
+    'CHUNKED_UPLOAD_DIR',
+    os.path.join(BASE_DIR, 'work_dir', 'backend', 'uploads')
+)
+
+SHOPPING_LIST_DIR = os.getenv(
+    'SHOPPING_LIST_DIR',
+    os.path.join(BASE_DIR, 'work_dir', 'backend', 'shopping_lists')
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,7 +1,16 @@
+from collections import defaultdict
+
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 
 from foodgram_app.models import Ingredient, Recipe, RecipeIngredient
 from user_page.models import Favorite, Shoping
+from user_page.shopping_totals import (
+    add_recipes,
+    apply_recipe_change,
+    remove_recipes
+)
 
 
 @admin.register(Ingredient)
@@ -21,6 +30,41 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ("recipe", "ingredient", "amount")
     search_fields = ("recipe__name", "ingredient__name")
 
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            old = None
+            if change:
+                old = RecipeIngredient.objects.select_for_update().filter(
+                    pk=obj.pk).values_list(
+                        'recipe_id', 'ingredient_id', 'amount').first()
+            super().save_model(request, obj, form, change)
+            if old is not None:
+                recipe_id, ingredient_id, amount = old
+                apply_recipe_change(recipe_id, {ingredient_id: amount}, {})
+            apply_recipe_change(
+                obj.recipe_id, {}, {obj.ingredient_id: obj.amount})
+            obj.recipe.save(update_fields=['updated_at'])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            apply_recipe_change(
+                obj.recipe_id, {obj.ingredient_id: obj.amount}, {})
+            obj.recipe.save(update_fields=['updated_at'])
+
+    def delete_queryset(self, request, queryset):
+        removed = defaultdict(dict)
+        with transaction.atomic():
+            for recipe_id, ingredient_id, amount in (
+                    queryset.select_for_update().values_list(
+                        'recipe_id', 'ingredient_id', 'amount')):
+                removed[recipe_id][ingredient_id] = amount
+            super().delete_queryset(request, queryset)
+            for recipe_id, amounts in removed.items():
+                apply_recipe_change(recipe_id, amounts, {})
+            Recipe.objects.filter(id__in=removed).update(
+                updated_at=timezone.now())
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -32,3 +76,31 @@ class FavoriteAdmin(admin.ModelAdmin):
 class ShopingAdmin(admin.ModelAdmin):
     list_display = ("user", "recipe")
     search_fields = ("user__username", "recipe__name")
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            old = None
+            if change:
+                old = Shoping.objects.select_for_update().filter(
+                    pk=obj.pk).values_list('user_id', 'recipe_id').first()
+            super().save_model(request, obj, form, change)
+            if old is not None:
+                user_id, recipe_id = old
+                remove_recipes(user_id, [recipe_id])
+            add_recipes(obj.user_id, [obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            remove_recipes(obj.user_id, [obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        removed = defaultdict(list)
+        with transaction.atomic():
+            for user_id, recipe_id in (
+                    queryset.select_for_update().values_list(
+                        'user_id', 'recipe_id')):
+                removed[user_id].append(recipe_id)
+            super().delete_queryset(request, queryset)
+            for user_id, recipe_ids in removed.items():
+                remove_recipes(user_id, recipe_ids)
@@ -6,9 +6,4 @@ class FoodgramAppConfig(AppConfig):
     name = 'foodgram_app'
 
     def ready(self):
-        from foodgram_app.load_test_data import (
-            load_ingredients_from_json,
-            load_recipes_from_json
-        )
-        load_ingredients_from_json()
-        load_recipes_from_json()
+        from foodgram_app import signals  # noqa: F401
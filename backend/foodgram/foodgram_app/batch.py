@@ -0,0 +1,74 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .cache import bump_generation
+from .serializers import BatchIdsSerializer
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+NOT_IN_LIST = 'not_in_list'
+NOT_FOUND = 'not_found'
+
+
+class BatchRelationView(APIView):
+    permission_classes = [IsAuthenticated]
+    toggle = None
+    target_model = None
+    generation = 'recipes'
+
+    def post(self, request):
+        ids = self.get_ids(request)
+        found = self.get_found(ids)
+        outcomes = {}
+        for pk in ids:
+            if pk not in found:
+                outcomes[pk] = NOT_FOUND
+            else:
+                outcomes[pk] = self.reject(request.user, pk)
+        added = self.toggle.add_many(
+            request.user.id,
+            [pk for pk, outcome in outcomes.items() if outcome is None]
+        )
+        if added:
+            bump_generation(self.generation)
+        results = []
+        for pk in ids:
+            outcome = outcomes[pk]
+            if outcome is None:
+                outcome = ADDED if pk in added else EXISTS
+            results.append({'id': pk, 'status': outcome})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        ids = self.get_ids(request)
+        found = self.get_found(ids)
+        removed = self.toggle.remove_many(request.user.id, ids)
+        if removed:
+            bump_generation(self.generation)
+        results = []
+        for pk in ids:
+            if pk in removed:
+                outcome = REMOVED
+            elif pk in found:
+                outcome = NOT_IN_LIST
+            else:
+                outcome = NOT_FOUND
+            results.append({'id': pk, 'status': outcome})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def get_ids(self, request):
+        serializer = BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['ids']))
+
+    def get_found(self, ids):
+        return set(
+            self.target_model.objects.filter(pk__in=ids)
+            .values_list('pk', flat=True)
+        )
+
+    def reject(self, user, pk):
+        return None
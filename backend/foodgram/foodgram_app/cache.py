@@ -0,0 +1,28 @@
+import time
+
+from django.core.cache import caches
+
+GENERATION_CACHE = 'generations'
+
+
+def _generation_key(name):
+    return f'generation:{name}'
+
+
+def get_generation(name):
+    cache = caches[GENERATION_CACHE]
+    key = _generation_key(name)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*names):
+    cache = caches[GENERATION_CACHE]
+    for name in names:
+        try:
+            cache.incr(_generation_key(name))
+        except ValueError:
+            cache.set(_generation_key(name), time.time_ns(), timeout=None)
@@ -0,0 +1,59 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def build_etag(*parts):
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def recipe_version(recipe):
+    return (
+        recipe.pk,
+        recipe.updated_at.timestamp(),
+        recipe.author.updated_at.timestamp(),
+        getattr(recipe, 'is_favorited', None),
+        getattr(recipe, 'is_in_shopping_cart', None),
+        getattr(recipe, 'is_author_subscribed', None),
+    )
+
+
+def recipes_last_modified(recipes):
+    return max(
+        (max(recipe.updated_at, recipe.author.updated_at)
+         for recipe in recipes),
+        default=None
+    )
+
+
+def not_modified_response(request, etag, last_modified=None):
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=(int(last_modified.timestamp())
+                       if last_modified else None)
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def conditional_response(request, entry, headers=None):
+    not_modified = not_modified_response(
+        request, entry['etag'], entry['last_modified'])
+    if not_modified is not None:
+        return not_modified
+    return set_validators(
+        Response(entry['data'], headers=headers),
+        entry['etag'],
+        entry['last_modified']
+    )
@@ -0,0 +1,38 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from user_login.models import Follow, User
+from user_page.models import Favorite, Shoping
+from .models import Recipe
+
+
+def adjust_counter(model, pk, field, delta):
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def _count_of(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def rebuild_counters():
+    recipes = Recipe.objects.update(
+        favorites_count=_count_of(Favorite, 'recipe'),
+        in_carts_count=_count_of(Shoping, 'recipe')
+    )
+    users = User.objects.update(
+        recipes_count=_count_of(Recipe, 'author'),
+        followers_count=_count_of(Follow, 'author')
+    )
+    return recipes, users
@@ -0,0 +1,159 @@
+import io
+import logging
+import os
+import time
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from user_login.models import User
+from .models import Recipe
+from .response_cache import invalidate_recipes
+from .storage import GRACE_PERIOD, content_storage, is_blob
+from .workers import submit
+
+RECIPE_VARIANTS = {
+    'card': (480, 320),
+    'detail': (1200, 800),
+}
+AVATAR_VARIANTS = {
+    'avatar': (160, 160),
+}
+VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {
+        'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+VARIANT_DIR = 'variants'
+
+logger = logging.getLogger(__name__)
+
+
+def build_variants(name, sizes):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    directory = os.path.dirname(name) if is_blob(name) else VARIANT_DIR
+    with content_storage.open(name, 'rb') as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image = image.convert('RGB')
+    variants = {}
+    for variant, size in sizes.items():
+        resized = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        variants[variant] = {}
+        for key, (image_format, ext, options) in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+            variants[variant][key] = content_storage.save(
+                f'{directory}/{stem}_{variant}.{ext}',
+                ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def variant_names(variants):
+    return {
+        name for formats in variants.values() for name in formats.values()}
+
+
+def delete_variants(variants, keep=None):
+    for name in variant_names(variants) - variant_names(keep or {}):
+        content_storage.delete(name)
+
+
+def is_referenced(name):
+    return (
+        Recipe.objects.filter(image=name).exists()
+        or User.objects.filter(avatar=name).exists()
+    )
+
+
+def _drop(name, cutoff):
+    if is_blob(name):
+        return content_storage.discard(name, cutoff)
+    content_storage.delete(name)
+    return True
+
+
+def release_image(name, variants=None):
+    cutoff = time.time() - GRACE_PERIOD
+    names = variant_names(variants or {})
+    owned = {variant for variant in names if not is_blob(variant)}
+    if name and not is_referenced(name) and _drop(name, cutoff):
+        owned = names
+    for variant in owned:
+        _drop(variant, cutoff)
+
+
+def referenced_names():
+    names = set()
+    for image, variants in Recipe.objects.values_list(
+            'image', 'image_variants').iterator():
+        names.add(image)
+        names |= variant_names(variants)
+    for avatar, variants in User.objects.exclude(avatar=None).values_list(
+            'avatar', 'avatar_variants').iterator():
+        names.add(avatar)
+        names |= variant_names(variants)
+    names.discard('')
+    return names
+
+
+def variant_urls(variants, request=None):
+    urls = {}
+    for variant, formats in variants.items():
+        urls[variant] = {}
+        for key, name in formats.items():
+            url = content_storage.url(name)
+            urls[variant][key] = (
+                request.build_absolute_uri(url) if request else url)
+    return urls
+
+
+def generate_recipe_variants(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_variants').first()
+    if recipe is None or not recipe.image:
+        return
+    try:
+        variants = build_variants(recipe.image.name, RECIPE_VARIANTS)
+    except Exception:
+        logger.exception('Image variants for recipe %s failed', recipe_id)
+        return
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_variants=variants, updated_at=timezone.now())
+    if updated:
+        delete_variants(recipe.image_variants, keep=variants)
+        invalidate_recipes(recipe_id)
+    else:
+        release_image(recipe.image.name, variants)
+
+
+def generate_avatar_variants(user_id):
+    user = User.objects.filter(pk=user_id).only(
+        'avatar', 'avatar_variants').first()
+    if user is None or not user.avatar:
+        return
+    try:
+        variants = build_variants(user.avatar.name, AVATAR_VARIANTS)
+    except Exception:
+        logger.exception('Avatar variants for user %s failed', user_id)
+        return
+    updated = User.objects.filter(
+        pk=user_id, avatar=user.avatar.name
+    ).update(avatar_variants=variants, updated_at=timezone.now())
+    if updated:
+        delete_variants(user.avatar_variants, keep=variants)
+        invalidate_recipes(*Recipe.objects.filter(
+            author_id=user_id).values_list('id', flat=True))
+    else:
+        release_image(user.avatar.name, variants)
+
+
+def schedule_variants(task, pk, old_name=None, old_variants=None):
+    def run():
+        if old_name:
+            release_image(old_name, old_variants)
+        submit(task, pk)
+    transaction.on_commit(run)
@@ -0,0 +1,145 @@
+import csv
+import json
+import re
+
+from django.db import connection
+
+from .models import MAX_MEASUREMENT_LENGTH, MAX_NAME_LENGTH, Ingredient
+
+READ_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+INGREDIENTS = Ingredient._meta.db_table
+
+STAGING_SQL = '''
+    CREATE TEMP TABLE ingredient_staging (
+        position bigserial,
+        name text,
+        measurement_unit text
+    ) ON COMMIT DROP
+'''
+
+COPY_SQL = '''
+    COPY ingredient_staging (name, measurement_unit)
+    FROM STDIN WITH (FORMAT csv)
+'''
+
+MERGE_SQL = f'''
+    WITH merged AS (
+        INSERT INTO {INGREDIENTS} (name, measurement_unit)
+        SELECT DISTINCT ON (name) name, measurement_unit
+        FROM ingredient_staging
+        ORDER BY name, position DESC
+        ON CONFLICT (name) DO UPDATE
+        SET measurement_unit = EXCLUDED.measurement_unit
+        WHERE {INGREDIENTS}.measurement_unit
+            IS DISTINCT FROM EXCLUDED.measurement_unit
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT
+        COUNT(*) FILTER (WHERE inserted),
+        COUNT(*) FILTER (WHERE NOT inserted)
+    FROM merged
+'''
+
+
+def iter_csv(path):
+    with open(path, encoding='utf-8', newline='') as source:
+        for row in csv.reader(source):
+            if len(row) == 2:
+                yield row
+            else:
+                yield None, None
+
+
+def iter_json(path):
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as source:
+        buffer, position = source.read(READ_SIZE), 0
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer[position:position + 1] != '[':
+            raise ValueError('Ожидается JSON-массив ингредиентов')
+        position += 1
+        while True:
+            position = SEPARATORS.match(buffer, position).end()
+            if buffer.startswith(']', position):
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = source.read(READ_SIZE)
+                if not chunk:
+                    raise
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            if isinstance(item, dict):
+                yield item.get('name'), item.get('measurement_unit')
+            else:
+                yield None, None
+
+
+READERS = {
+    'csv': iter_csv,
+    'json': iter_json,
+}
+
+
+def clean_rows(rows, stats):
+    for name, unit in rows:
+        stats['read'] += 1
+        if not isinstance(name, str) or not isinstance(unit, str):
+            stats['invalid'] += 1
+            continue
+        name, unit = name.strip().lower(), unit.strip().lower()
+        if (not name or not unit or len(name) > MAX_NAME_LENGTH
+                or len(unit) > MAX_MEASUREMENT_LENGTH):
+            stats['invalid'] += 1
+            continue
+        yield name, unit
+
+
+class CopyStream:
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.error = None
+        self._writer = csv.writer(self, lineterminator='\n')
+
+    def write(self, value):
+        self._buffer += value
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                row = next(self._rows, None)
+            except Exception as error:
+                self.error = error
+                raise
+            if row is None:
+                break
+            self._writer.writerow(row)
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def import_ingredients(path, file_format):
+    stats = {'read': 0, 'invalid': 0}
+    rows = clean_rows(READERS[file_format](path), stats)
+    stream = CopyStream(rows)
+    with connection.cursor() as cursor:
+        cursor.execute(STAGING_SQL)
+        try:
+            cursor.copy_expert(COPY_SQL, stream)
+        except Exception:
+            if stream.error is not None:
+                raise stream.error from None
+            raise
+        cursor.execute(MERGE_SQL)
+        inserted, updated = cursor.fetchone()
+    return {
+        'inserted': inserted,
+        'updated': updated,
+        'skipped': stats['read'] - inserted - updated,
+        'invalid': stats['invalid'],
+    }
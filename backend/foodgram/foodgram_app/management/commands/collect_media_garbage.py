@@ -0,0 +1,99 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodgram_app.images import VARIANT_DIR, referenced_names
+from foodgram_app.models import ImageUpload, Recipe
+from foodgram_app.storage import BLOB_DIR, GRACE_PERIOD, content_storage
+from foodgram_app.uploads import discard_upload, upload_path
+from user_login.models import User
+
+UPLOAD_TTL = timedelta(days=1)
+
+
+def media_dirs():
+    return [
+        BLOB_DIR,
+        VARIANT_DIR,
+        Recipe._meta.get_field('image').upload_to.rstrip('/'),
+        User._meta.get_field('avatar').upload_to.rstrip('/'),
+    ]
+
+
+def walk_files(directory, prune=True):
+    root = content_storage.path(directory)
+    for path, _, files in os.walk(root, topdown=False):
+        for filename in files:
+            full_path = os.path.join(path, filename)
+            yield (
+                os.path.relpath(full_path, content_storage.location)
+                .replace(os.sep, '/'),
+                full_path
+            )
+        if prune and path != root and not os.listdir(path):
+            os.rmdir(path)
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы изображений, на которые не ссылается ни одна запись'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы, которые будут удалены'
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=GRACE_PERIOD,
+            help='Не трогать файлы моложе указанного числа секунд'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options['grace']
+        referenced = referenced_names()
+        removed = freed = 0
+        for directory in media_dirs():
+            for name, full_path in walk_files(
+                    directory, prune=not options['dry_run']):
+                if name in referenced:
+                    continue
+                stat = os.stat(full_path)
+                if stat.st_mtime > cutoff:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(name)
+                elif not content_storage.discard(name, cutoff):
+                    continue
+                removed += 1
+                freed += stat.st_size
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {removed}, освобождено байт: {freed}'))
+        if not options['dry_run']:
+            self.collect_uploads(cutoff)
+
+    def collect_uploads(self, cutoff):
+        stale = ImageUpload.objects.filter(
+            created_at__lt=timezone.now() - UPLOAD_TTL)
+        expired = 0
+        for upload in stale.iterator():
+            discard_upload(upload)
+            expired += 1
+        active = {
+            upload_path(pk)
+            for pk in ImageUpload.objects.values_list('pk', flat=True)
+        }
+        directory = settings.CHUNKED_UPLOAD_DIR
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                path = os.path.join(directory, filename)
+                if path not in active and os.stat(path).st_mtime <= cutoff:
+                    os.remove(path)
+                    expired += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено незавершённых загрузок: {expired}'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from foodgram_app.images import (
+    generate_avatar_variants,
+    generate_recipe_variants
+)
+from foodgram_app.models import Recipe
+from user_login.models import User
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии фото рецептов и аватаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии и для уже обработанных изображений'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        users = User.objects.exclude(avatar='').exclude(avatar=None)
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+            users = users.filter(avatar_variants={})
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        user_ids = list(users.values_list('id', flat=True))
+        for recipe_id in recipe_ids:
+            generate_recipe_variants(recipe_id)
+        for user_id in user_ids:
+            generate_avatar_variants(user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {len(recipe_ids)}, '
+            f'аватаров: {len(user_ids)}'))
@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from foodgram_app.cache import bump_generation
+from foodgram_app.ingredient_import import READERS, import_ingredients
+from foodgram_app.seed import DATA_DIR
+
+
+class Command(BaseCommand):
+    help = 'Импортирует ингредиенты из CSV или JSON через COPY'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(DATA_DIR, 'ingredients.csv'),
+            help='Файл с ингредиентами'
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='Формат файла; по умолчанию определяется по расширению'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'Импорт через COPY поддерживается только для PostgreSQL')
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден')
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла: {file_format or path}')
+        try:
+            with transaction.atomic():
+                stats = import_ingredients(path, file_format)
+                transaction.on_commit(
+                    lambda: bump_generation('ingredients'))
+        except (ValueError, UnicodeDecodeError) as error:
+            raise CommandError(f'Некорректные данные в {path}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {stats["inserted"]}, '
+            f'обновлено: {stats["updated"]}, '
+            f'пропущено: {stats["skipped"]} '
+            f'(из них некорректных строк: {stats["invalid"]})'))
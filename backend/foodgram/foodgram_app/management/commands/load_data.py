@@ -0,0 +1,55 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from foodgram_app.counters import rebuild_counters
+from foodgram_app.models import DataLoad
+from foodgram_app.seed import DATA_DIR, SOURCES, file_checksum, read_records
+
+
+class Command(BaseCommand):
+    help = 'Загружает тестовые данные, пропуская неизменившиеся файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-dir',
+            default=DATA_DIR,
+            help='Каталог с файлами данных'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Загрузить данные, даже если файлы не изменились'
+        )
+
+    def handle(self, *args, **options):
+        checksums = dict(DataLoad.objects.values_list('source', 'checksum'))
+        reloaded = set()
+        with transaction.atomic():
+            for source, filename, load, depends_on in SOURCES:
+                path = os.path.join(options['data_dir'], filename)
+                if not os.path.exists(path):
+                    self.stdout.write(self.style.WARNING(
+                        f'{source}: файл {path} не найден, пропускаем'))
+                    continue
+                checksum = file_checksum(path)
+                if (not options['force']
+                        and checksums.get(source) == checksum
+                        and not reloaded & set(depends_on)):
+                    self.stdout.write(f'{source}: без изменений')
+                    continue
+                try:
+                    created, updated = load(read_records(path))
+                except (ValueError, KeyError, TypeError) as error:
+                    raise CommandError(
+                        f'{source}: некорректные данные в {path}: {error!r}')
+                DataLoad.objects.update_or_create(
+                    source=source, defaults={'checksum': checksum})
+                reloaded.add(source)
+                self.stdout.write(
+                    f'{source}: добавлено {created}, обновлено {updated}')
+            if reloaded:
+                rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено источников: {len(reloaded)}'))
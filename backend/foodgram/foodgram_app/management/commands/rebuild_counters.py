@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodgram_app.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики рецептов, подписчиков и избранного'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes, users = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {recipes}, пользователей: {users}'))
@@ -1,11 +1,21 @@
+import uuid
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from user_login.models import User
+from .storage import content_storage
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 MIN_COOK_AND_AMOUNT = 1
 MAX_COOK_AND_AMOUNT = 32000
 MAX_NAME_LENGTH = 200
 MAX_MEASUREMENT_LENGTH = 50
+MAX_FILENAME_LENGTH = 255
+MAX_SOURCE_LENGTH = 100
+CHECKSUM_LENGTH = 64
+SEARCH_CONFIG = 'russian'
 
 
 class Ingredient(models.Model):
@@ -18,6 +28,12 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = [
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'],
+                     name='ingredient_name_trgm_idx'),
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'),
+                     name='ingredient_name_upper_trgm_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.measurement_unit})"
@@ -32,7 +48,11 @@ class Recipe(models.Model):
     name = models.CharField(max_length=MAX_NAME_LENGTH,
                             verbose_name='Название рецепта')
     image = models.ImageField(
-        upload_to='static/posts/', verbose_name='Фото')
+        upload_to='static/posts/', storage=content_storage,
+        db_index=True, verbose_name='Фото')
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False,
+        verbose_name='Уменьшенные копии фото')
     text = models.TextField(verbose_name='Рецепт')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -45,11 +65,31 @@ class Recipe(models.Model):
             MinValueValidator(MIN_COOK_AND_AMOUNT),
             MaxValueValidator(MAX_COOK_AND_AMOUNT)
         ])
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name='Дата изменения')
+    revision = models.BigIntegerField(
+        default=0, editable=False, db_index=True, verbose_name='Ревизия')
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В избранном')
+    in_carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В списках покупок')
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        verbose_name='Поисковый вектор'
+    )
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -61,6 +101,7 @@ class RecipeIngredient(models.Model):
         related_name='recipe_ingredient',
         verbose_name='Рецепт')
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE,
+                                   db_index=False,
                                    verbose_name='Ингредиент')
     amount = models.PositiveSmallIntegerField(
         verbose_name='Кол-во ингредиента', validators=[
@@ -72,3 +113,69 @@ class RecipeIngredient(models.Model):
         ordering = ['recipe']
         verbose_name = 'Рецепт/Ингредиент'
         unique_together = ('recipe', 'ingredient')
+        indexes = [
+            models.Index(fields=['ingredient', 'recipe'],
+                         name='ingredient_recipe_idx'),
+        ]
+
+
+class ImageUpload(models.Model):
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='image_uploads',
+        verbose_name='Пользователь'
+    )
+    filename = models.CharField(
+        max_length=MAX_FILENAME_LENGTH,
+        verbose_name='Имя файла'
+    )
+    size = models.PositiveIntegerField(verbose_name='Размер файла')
+    offset = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Загружено байт'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана'
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Загрузка изображения'
+        verbose_name_plural = 'Загрузки изображений'
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+    @property
+    def complete(self):
+        return self.offset == self.size
+
+
+class DataLoad(models.Model):
+    source = models.CharField(
+        max_length=MAX_SOURCE_LENGTH,
+        unique=True,
+        verbose_name='Источник'
+    )
+    checksum = models.CharField(
+        max_length=CHECKSUM_LENGTH,
+        verbose_name='Контрольная сумма'
+    )
+    loaded_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Загружено'
+    )
+
+    class Meta:
+        verbose_name = 'Загрузка данных'
+        verbose_name_plural = 'Загрузки данных'
+
+    def __str__(self):
+        return self.source
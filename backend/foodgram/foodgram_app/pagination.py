@@ -0,0 +1,122 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from .cache import get_generation
+
+COUNT_CACHE_TIMEOUT = 300
+ESTIMATE_MIN_ROWS = 10000
+COUNT_IGNORED_PARAMS = ('page', 'limit', 'cursor', 'pagination')
+
+
+def exact_count(queryset, request, view):
+    return queryset.count()
+
+
+def cached_count(queryset, request, view):
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        if key not in COUNT_IGNORED_PARAMS
+        for value in values
+    )
+    user_id = request.user.id if request.user.is_authenticated else 0
+    digest = hashlib.md5(
+        repr((request.path, user_id, params)).encode()
+    ).hexdigest()
+    key = 'count:{}:{}:{}'.format(
+        queryset.model._meta.label_lower,
+        get_generation(getattr(view, 'count_generation', 'default')),
+        digest
+    )
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def estimated_count(queryset, request, view):
+    if queryset.query.where or connection.vendor != 'postgresql':
+        return cached_count(queryset, request, view)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < ESTIMATE_MIN_ROWS:
+        return cached_count(queryset, request, view)
+    return row[0]
+
+
+COUNT_STRATEGIES = {
+    'exact': exact_count,
+    'cached': cached_count,
+    'estimate': estimated_count,
+}
+
+
+class CountingPaginator(Paginator):
+    def __init__(self, object_list, per_page, count_func, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        return self.count_func(self.object_list)
+
+
+class CountStrategyMixin:
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, object_list, per_page):
+        strategy = COUNT_STRATEGIES[
+            getattr(self.view, 'count_strategy', 'exact')]
+        return CountingPaginator(
+            object_list,
+            per_page,
+            lambda queryset: strategy(queryset, self.request, self.view)
+        )
+
+
+class CustomPagination(CountStrategyMixin, PageNumberPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_page_version(self):
+        return self.page.paginator.count
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = '-id'
+
+    def get_page_version(self):
+        return self.has_next, self.has_previous
+
+
+def wants_cursor_pagination(request):
+    params = request.query_params
+    return (
+        params.get('pagination') == 'cursor'
+        and not params.get('search', '').strip()
+    )
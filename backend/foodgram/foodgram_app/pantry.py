@@ -0,0 +1,121 @@
+import heapq
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from django.db import connection
+
+from .models import Recipe, RecipeIngredient
+
+RECIPES = Recipe._meta.db_table
+
+REVISION_TRIGGER_SQL = f'''
+    CREATE OR REPLACE FUNCTION recipe_set_revision() RETURNS trigger AS $$
+    BEGIN
+        NEW.revision := pg_current_xact_id()::text::bigint;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    CREATE OR REPLACE TRIGGER recipe_revision
+    BEFORE INSERT OR UPDATE OF updated_at ON {RECIPES}
+    FOR EACH ROW EXECUTE FUNCTION recipe_set_revision();
+'''
+
+SYNC_MARKER_SQL = '''
+    SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+'''
+
+
+def sync_marker():
+    with connection.cursor() as cursor:
+        cursor.execute(SYNC_MARKER_SQL)
+        return cursor.fetchone()[0]
+
+
+class PantryIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._recipes = {}
+        self._postings = defaultdict(set)
+        self._synced_to = None
+
+    def match(self, ingredient_ids, max_missing, limit):
+        self.refresh()
+        matched = Counter()
+        with self._lock:
+            for ingredient_id in set(ingredient_ids):
+                matched.update(self._postings.get(ingredient_id, ()))
+            candidates = []
+            for recipe_id, hits in matched.items():
+                missing = len(self._recipes[recipe_id]) - hits
+                if missing <= max_missing:
+                    candidates.append((
+                        hits / len(self._recipes[recipe_id]),
+                        -missing,
+                        recipe_id
+                    ))
+        return [
+            (recipe_id, coverage, -negative_missing)
+            for coverage, negative_missing, recipe_id
+            in heapq.nlargest(limit, candidates)
+        ]
+
+    def refresh(self):
+        with self._lock:
+            marker = sync_marker()
+            if self._synced_to is None:
+                self.rebuild(marker)
+                return
+            changed = list(Recipe.objects.filter(
+                revision__gte=self._synced_to
+            ).values_list('id', flat=True))
+            if changed:
+                recipes = self._load(
+                    RecipeIngredient.objects.filter(recipe_id__in=changed))
+                for recipe_id in changed:
+                    self.update_recipe(recipe_id, recipes.get(recipe_id, ()))
+            self._synced_to = marker
+
+    def rebuild(self, marker=None):
+        if marker is None:
+            marker = sync_marker()
+        recipes = self._load(RecipeIngredient.objects.all())
+        postings = defaultdict(set)
+        for recipe_id, ingredient_ids in recipes.items():
+            for ingredient_id in ingredient_ids:
+                postings[ingredient_id].add(recipe_id)
+        with self._lock:
+            self._recipes = {
+                recipe_id: array('q', sorted(ingredient_ids))
+                for recipe_id, ingredient_ids in recipes.items()
+            }
+            self._postings = postings
+            self._synced_to = marker
+
+    def update_recipe(self, recipe_id, ingredient_ids):
+        with self._lock:
+            self._remove(recipe_id)
+            if ingredient_ids:
+                self._recipes[recipe_id] = array(
+                    'q', sorted(set(ingredient_ids)))
+                for ingredient_id in self._recipes[recipe_id]:
+                    self._postings[ingredient_id].add(recipe_id)
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            self._remove(recipe_id)
+
+    def _remove(self, recipe_id):
+        for ingredient_id in self._recipes.pop(recipe_id, ()):
+            self._postings[ingredient_id].discard(recipe_id)
+
+    @staticmethod
+    def _load(queryset):
+        recipes = defaultdict(list)
+        for recipe_id, ingredient_id in queryset.order_by().values_list(
+                'recipe_id', 'ingredient_id').iterator(chunk_size=10000):
+            recipes[recipe_id].append(ingredient_id)
+        return recipes
+
+
+pantry_index = PantryIndex()
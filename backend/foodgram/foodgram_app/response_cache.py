@@ -0,0 +1,68 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+from .cache import bump_generation, get_generation
+
+RESPONSE_CACHE_TIMEOUT = 600
+STATS_KEYS = {
+    'hits': 'response_cache:hits',
+    'misses': 'response_cache:misses',
+}
+
+
+def is_cacheable(request):
+    return request.method == 'GET' and not request.user.is_authenticated
+
+
+def _normalized_query(request):
+    return urlencode(sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    ))
+
+
+def recipe_list_key(request):
+    digest = hashlib.md5(
+        f'{request.get_host()}?{_normalized_query(request)}'.encode()
+    ).hexdigest()
+    return 'response:recipes:{}:{}:{}'.format(
+        get_generation('recipe_feed'), get_generation('ingredients'), digest)
+
+
+def recipe_detail_key(request, recipe_id):
+    digest = hashlib.md5(request.get_host().encode()).hexdigest()
+    return 'response:recipe:{}:{}:{}:{}'.format(
+        recipe_id,
+        get_generation(f'recipe:{recipe_id}'),
+        get_generation('ingredients'),
+        digest
+    )
+
+
+def get_cached_response(key):
+    data = cache.get(key)
+    _count('hits' if data is not None else 'misses')
+    return data
+
+
+def set_cached_response(key, data):
+    cache.set(key, data, RESPONSE_CACHE_TIMEOUT)
+
+
+def invalidate_recipes(*recipe_ids):
+    bump_generation('recipe_feed', *(f'recipe:{pk}' for pk in recipe_ids))
+
+
+def get_stats():
+    values = cache.get_many(STATS_KEYS.values())
+    return {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+
+
+def _count(name):
+    try:
+        cache.incr(STATS_KEYS[name])
+    except ValueError:
+        cache.add(STATS_KEYS[name], 1, timeout=None)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from user_login.models import User
+from user_page.models import Shoping
+from user_page.shopping_totals import rebuild as rebuild_shopping_totals
+from .cache import bump_generation
+from .models import Ingredient, Recipe, RecipeIngredient
+from .response_cache import invalidate_recipes
+
+BATCH_SIZE = 1000
+CHECKSUM_CHUNK_SIZE = 64 * 1024
+DATA_DIR = os.path.join(settings.BASE_DIR, 'data')
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHECKSUM_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def load_ingredients(records):
+    ingredients = {}
+    for item in records:
+        name = item['name'].strip().lower()
+        ingredients[name] = Ingredient(
+            name=name, measurement_unit=item['measurement_unit'].lower())
+    existing = set(Ingredient.objects.filter(
+        name__in=ingredients).values_list('name', flat=True))
+    Ingredient.objects.bulk_create(
+        ingredients.values(),
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=['measurement_unit'],
+        batch_size=BATCH_SIZE
+    )
+    transaction.on_commit(partial(bump_generation, 'ingredients'))
+    return len(ingredients.keys() - existing), len(existing)
+
+
+def load_users(records):
+    users = {item['email']: item for item in records}
+    existing = set(User.objects.filter(
+        email__in=users).values_list('email', flat=True))
+    User.objects.bulk_create(
+        [
+            User(
+                email=email,
+                username=item['username'],
+                first_name=item['first_name'],
+                last_name=item['last_name'],
+                avatar=item.get('avatar', ''),
+                password=make_password(item['password'])
+            )
+            for email, item in users.items() if email not in existing
+        ],
+        ignore_conflicts=True,
+        batch_size=BATCH_SIZE
+    )
+    transaction.on_commit(partial(bump_generation, 'users'))
+    return len(users.keys() - existing), len(existing)
+
+
+def load_recipes(records):
+    authors = dict(User.objects.filter(
+        email__in={item['author_email'] for item in records}
+    ).values_list('email', 'id'))
+    ingredients = dict(Ingredient.objects.values_list('name', 'id'))
+    recipes = {}
+    for item in records:
+        author_id = authors.get(item['author_email'])
+        if author_id is None:
+            continue
+        recipes[(author_id, item['name'])] = item
+    existing = {
+        (author_id, name): recipe_id
+        for recipe_id, author_id, name in Recipe.objects.filter(
+            author_id__in=set(authors.values()),
+            name__in={name for _, name in recipes}
+        ).values_list('id', 'author_id', 'name')
+    }
+    now = timezone.now()
+    updated, created = [], []
+    for key, item in recipes.items():
+        recipe = Recipe(
+            pk=existing.get(key),
+            author_id=key[0],
+            name=key[1],
+            image=item['image'],
+            text=item['text'],
+            cooking_time=item['cooking_time'],
+            updated_at=now
+        )
+        (updated if recipe.pk else created).append(recipe)
+    Recipe.objects.bulk_update(
+        updated, ['image', 'text', 'cooking_time', 'updated_at'],
+        batch_size=BATCH_SIZE)
+    Recipe.objects.bulk_create(created, batch_size=BATCH_SIZE)
+    recipe_ids = {
+        (recipe.author_id, recipe.name): recipe.pk
+        for recipe in updated + created
+    }
+    RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids.values()).delete()
+    relations = {}
+    for key, item in recipes.items():
+        for component in item['components']:
+            ingredient_id = ingredients.get(component['name'].lower())
+            if ingredient_id is not None:
+                relations[(recipe_ids[key], ingredient_id)] = (
+                    component['amount'])
+    RecipeIngredient.objects.bulk_create(
+        [
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for (recipe_id, ingredient_id), amount in relations.items()
+        ],
+        batch_size=BATCH_SIZE
+    )
+    rebuild_shopping_totals(Shoping.objects.filter(
+        recipe_id__in=[recipe.pk for recipe in updated]
+    ).values_list('user_id', flat=True).distinct())
+    transaction.on_commit(partial(bump_generation, 'recipes'))
+    transaction.on_commit(partial(
+        invalidate_recipes, *[recipe.pk for recipe in updated]))
+    return len(created), len(updated)
+
+
+SOURCES = [
+    ('ingredients', 'ingredients.json', load_ingredients, ()),
+    ('users', 'users.json', load_users, ()),
+    ('recipes', 'recipes.json', load_recipes, ('ingredients', 'users')),
+]
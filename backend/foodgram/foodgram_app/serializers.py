@@ -1,37 +1,120 @@
 from rest_framework import serializers
-from .models import Recipe, RecipeIngredient, Ingredient
+from .models import ImageUpload, Recipe, RecipeIngredient, Ingredient
 from django.core.validators import MinValueValidator, MaxValueValidator
 import base64
+import json
+import os
 import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.core.files.base import ContentFile
+from django.http import QueryDict
+from django.utils.text import get_valid_filename
+from user_login.models import User
 from user_login.serializers import UserReadSerializer
+from .cache import get_generation
+from .counters import adjust_counter
+from .images import (
+    generate_recipe_variants,
+    schedule_variants,
+    variant_urls
+)
+from .pantry import pantry_index
+from .uploads import UPLOAD_PREFIX, close_image, resolve_upload
+from user_page.models import ShoppingListJob
+from user_page.shopping_totals import apply_recipe_change
 
 MIN_COOK_AND_AMOUNT = 1
 MAX_COOK_AND_AMOUNT = 32000
+FRAGMENT_VERSION = 2
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+IMAGE_TOO_LARGE = 'Размер изображения не должен превышать {} МБ'
+
+
+def image_too_large():
+    return IMAGE_TOO_LARGE.format(
+        settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024))
 
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
+        max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+        if isinstance(data, str) and data.startswith(UPLOAD_PREFIX):
+            request = self.context.get('request')
+            data = resolve_upload(getattr(request, 'user', None), data)
+        elif isinstance(data, str) and ';base64,' in data:
+            if len(data) * 3 // 4 > max_size:
+                raise serializers.ValidationError(image_too_large())
+        if getattr(data, 'size', 0) > max_size:
+            close_image(data)
+            raise serializers.ValidationError(image_too_large())
         try:
-            if ';base64,' in data:
+            if isinstance(data, str) and ';base64,' in data:
                 format, imgstr = data.split(';base64,')
                 ext = format.split('/')[-1]
                 filename = f"{uuid.uuid4()}.{ext}"
-                return ContentFile(base64.b64decode(imgstr), name=filename)
+                data = ContentFile(base64.b64decode(imgstr), name=filename)
             return super().to_internal_value(data)
         except Exception:
+            close_image(data)
             raise serializers.ValidationError(
                 "Неправильный формат изображения")
 
 
+class AvatarUploadSerializer(serializers.Serializer):
+    avatar = Base64ImageField()
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    reference = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageUpload
+        fields = [
+            'id', 'filename', 'size', 'offset', 'complete', 'reference']
+        read_only_fields = ['id', 'offset', 'complete', 'reference']
+
+    def validate_filename(self, value):
+        return get_valid_filename(os.path.basename(value))
+
+    def validate_size(self, value):
+        if value > settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(image_too_large())
+        return value
+
+    def get_reference(self, obj):
+        return f'{UPLOAD_PREFIX}{obj.pk}' if obj.complete else None
+
+
+class IngredientInRecipeListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ingredients = Ingredient.objects.in_bulk(
+            {item['id'] for item in items})
+        missing = sorted(
+            {item['id'] for item in items} - ingredients.keys())
+        if missing:
+            raise serializers.ValidationError(
+                'Ингредиенты не найдены: '
+                + ', '.join(str(pk) for pk in missing)
+            )
+        for item in items:
+            item['id'] = ingredients[item['id']]
+        return items
+
+
 class IngredientInRecipeWriteSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField(min_value=1)
     amount = serializers.IntegerField(
         validators=[
             MinValueValidator(MIN_COOK_AND_AMOUNT),
             MaxValueValidator(MAX_COOK_AND_AMOUNT)
         ])
 
+    class Meta:
+        list_serializer_class = IngredientInRecipeListSerializer
+
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='ingredient.id')
@@ -44,28 +127,101 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit', 'amount']
 
 
+class RecipeFragmentListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return self.child.represent_many(list(data))
+
+
+class RecipeAuthorSerializer(UserReadSerializer):
+    def get_is_subscribed(self, obj):
+        if getattr(self.parent, 'building_fragment', False):
+            return False
+        return super().get_is_subscribed(obj)
+
+
 class RecipeListSerializer(serializers.ModelSerializer):
-    author = UserReadSerializer(read_only=True)
+    author = RecipeAuthorSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
         source='recipe_ingredient',
         many=True, read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_variants',
+            'text', 'cooking_time'
         ]
+        list_serializer_class = RecipeFragmentListSerializer
+
+    def to_representation(self, instance):
+        return self.represent_many([instance])[0]
+
+    def represent_many(self, instances):
+        catalog = get_generation('ingredients')
+        keys = {
+            instance.pk: self.get_fragment_key(instance, catalog)
+            for instance in instances
+        }
+        fragments = cache.get_many(keys.values())
+        missing = {}
+        result = []
+        for instance in instances:
+            fragment = fragments.get(keys[instance.pk])
+            if fragment is None:
+                fragment = self.build_fragment(instance)
+                missing[keys[instance.pk]] = fragment
+            result.append(self.merge_user_flags(fragment, instance))
+        if missing:
+            cache.set_many(missing, FRAGMENT_TIMEOUT)
+        return result
+
+    def get_fragment_key(self, instance, catalog):
+        return 'recipe_fragment:{}:{}:{}:{}:{}:{}'.format(
+            FRAGMENT_VERSION,
+            self.context['request'].get_host(),
+            instance.pk,
+            instance.updated_at.timestamp(),
+            instance.author.updated_at.timestamp(),
+            catalog
+        )
+
+    def build_fragment(self, instance):
+        self.building_fragment = True
+        try:
+            return super().to_representation(instance)
+        finally:
+            self.building_fragment = False
+
+    def merge_user_flags(self, fragment, instance):
+        data = dict(fragment)
+        data['author'] = dict(fragment['author'])
+        data['is_favorited'] = self.get_is_favorited(instance)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(instance)
+        if hasattr(instance, 'is_author_subscribed'):
+            data['author']['is_subscribed'] = instance.is_author_subscribed
+        else:
+            data['author']['is_subscribed'] = (
+                self.fields['author'].get_is_subscribed(instance.author))
+        return data
 
     def get_image(self, obj):
         if obj.image:
             return self.context['request'].build_absolute_uri(obj.image.url)
         return None
 
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image_variants, self.context['request'])
+
     def get_is_favorited(self, obj):
+        if getattr(self, 'building_fragment', False):
+            return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         return (
             user.is_authenticated
@@ -73,6 +229,10 @@ class RecipeListSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if getattr(self, 'building_fragment', False):
+            return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         return (
             user.is_authenticated
@@ -85,7 +245,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     image = Base64ImageField(required=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    cooking_time = serializers.SerializerMethodField(
+    cooking_time = serializers.IntegerField(
         validators=[
             MinValueValidator(MIN_COOK_AND_AMOUNT),
             MaxValueValidator(MAX_COOK_AND_AMOUNT)
@@ -100,6 +260,18 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'author',
                             'is_favorited', 'is_in_shopping_cart']
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = data.dict()
+            if isinstance(data.get('ingredients'), str):
+                try:
+                    data['ingredients'] = json.loads(data['ingredients'])
+                except ValueError:
+                    raise serializers.ValidationError({
+                        'ingredients': 'Ингредиенты должны быть JSON-списком'
+                    })
+        return super().to_internal_value(data)
+
     def validate(self, data):
         if 'ingredients' not in data or not data['ingredients']:
             raise serializers.ValidationError({
@@ -114,24 +286,35 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(
-            author=self.context['request'].user,
-            **validated_data
-        )
+        author = self.context['request'].user
+        recipe = Recipe.objects.create(author=author, **validated_data)
+        close_image(validated_data.get('image'))
+        adjust_counter(User, author.pk, 'recipes_count', 1)
 
         self._create_ingredient_relations(recipe, ingredients_data)
+        self._update_pantry_index(recipe, ingredients_data)
+        schedule_variants(generate_recipe_variants, recipe.pk)
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', None)
 
-        self._update_recipe_fields(instance, validated_data)
-
         if ingredients_data:
             self._refresh_recipe_ingredients(instance, ingredients_data)
+            self._update_pantry_index(instance, ingredients_data)
+
+        if 'image' in validated_data:
+            schedule_variants(
+                generate_recipe_variants, instance.pk,
+                instance.image.name, instance.image_variants)
+            validated_data['image_variants'] = {}
+        self._update_recipe_fields(instance, validated_data)
+        close_image(validated_data.get('image'))
 
         return instance
 
@@ -141,23 +324,62 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         instance.save()
 
     def _refresh_recipe_ingredients(self, recipe, ingredients_data):
-        RecipeIngredient.recipe_ingredient.all().delete()
+        list(Recipe.objects.select_for_update().filter(pk=recipe.pk)
+             .values_list('pk', flat=True))
+        current = {
+            relation.ingredient_id: relation
+            for relation in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        wanted = {item['id'].id: item for item in ingredients_data}
+        old_amounts = {
+            ingredient_id: relation.amount
+            for ingredient_id, relation in current.items()
+        }
+
+        changed = []
+        for ingredient_id, item in wanted.items():
+            relation = current.get(ingredient_id)
+            if relation is not None and relation.amount != item['amount']:
+                relation.amount = item['amount']
+                changed.append(relation)
+        removed = [
+            relation.pk for ingredient_id, relation in current.items()
+            if ingredient_id not in wanted
+        ]
 
-        self._create_ingredient_relations(recipe, ingredients_data)
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self._create_ingredient_relations(recipe, [
+            item for ingredient_id, item in wanted.items()
+            if ingredient_id not in current
+        ])
+        apply_recipe_change(recipe.id, old_amounts, {
+            ingredient_id: item['amount']
+            for ingredient_id, item in wanted.items()
+        })
 
     def _create_ingredient_relations(self, recipe, ingredients_data):
-        for ingredient_item in ingredients_data:
-            RecipeIngredient.objects.create(
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
                 recipe=recipe,
                 ingredient=ingredient_item['id'],
                 amount=ingredient_item['amount']
             )
+            for ingredient_item in ingredients_data
+        ])
+
+    def _update_pantry_index(self, recipe, ingredients_data):
+        ingredient_ids = [item['id'].id for item in ingredients_data]
+        transaction.on_commit(
+            lambda: pantry_index.update_recipe(recipe.id, ingredient_ids))
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
         return (
             request and request.user.is_authenticated
-            and obj.favorites.filter(user=request.user).exists()
+            and obj.in_favorites.filter(user=request.user).exists()
         )
 
     def get_is_in_shopping_cart(self, obj):
@@ -170,12 +392,52 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_variants', 'cooking_time']
 
     def get_image(self, obj):
         if obj.image:
             return self.context['request'].build_absolute_uri(obj.image.url)
         return None
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image_variants, self.context['request'])
+
+
+class PantryMatchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500
+    )
+    max_missing = serializers.IntegerField(min_value=0, default=3)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class BatchIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
+class ShoppingListJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ShoppingListJob
+        fields = [
+            'id', 'format', 'status', 'error',
+            'created_at', 'finished_at', 'download_url'
+        ]
+
+    def get_download_url(self, obj):
+        if obj.status != ShoppingListJob.DONE:
+            return None
+        url = f'/api/recipes/shopping_list_jobs/{obj.pk}/download/'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,182 @@
+import csv
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from user_login.models import User
+from user_page.models import ShoppingListItem, ShoppingListJob
+from .workers import submit
+
+EXPORT_CHUNK_SIZE = 2000
+JOB_STALE_AFTER = timedelta(minutes=10)
+ACTIVE_STATUSES = (ShoppingListJob.PENDING, ShoppingListJob.RUNNING)
+TITLE = 'Список покупок'
+CSV_HEADER = ['Ингредиент', 'Количество', 'Единица измерения']
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FALLBACK_FONT = 'Helvetica'
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+PDF_READ_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def shopping_list_rows(user):
+    return (
+        ShoppingListItem.objects
+        .filter(user=user, total_amount__gt=0)
+        .values_list(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'total_amount'
+        )
+        .order_by('ingredient__name')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def render_txt(rows):
+    yield f'{TITLE}:\n\n'
+    for name, unit, amount in rows:
+        yield f'- {name}: {amount} {unit}\n'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for name, unit, amount in rows:
+        yield writer.writerow([name, amount, unit])
+
+
+def _pdf_font():
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    path = settings.SHOPPING_LIST_PDF_FONT
+    if not os.path.exists(path):
+        return PDF_FALLBACK_FONT
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+    return PDF_FONT_NAME
+
+
+def render_pdf(rows):
+    font = _pdf_font()
+    width, height = A4
+    with tempfile.TemporaryFile() as buffer:
+        pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+        y = height - PDF_MARGIN
+        pdf.setFont(font, 16)
+        pdf.drawString(PDF_MARGIN, y, TITLE)
+        y -= PDF_LINE_HEIGHT * 2
+        pdf.setFont(font, 12)
+        for name, unit, amount in rows:
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(font, 12)
+                y = height - PDF_MARGIN
+            pdf.drawString(PDF_MARGIN, y, f'• {name} — {amount} {unit}')
+            y -= PDF_LINE_HEIGHT
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(partial(buffer.read, PDF_READ_SIZE), b'')
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'pdf': ('application/pdf', render_pdf),
+}
+
+
+def _hashed(rows, digest):
+    for row in rows:
+        digest.update(repr(row).encode())
+        yield row
+
+
+def cart_hash(user):
+    digest = hashlib.sha256()
+    for _ in _hashed(shopping_list_rows(user), digest):
+        pass
+    return digest.hexdigest()
+
+
+def enqueue_job(user, export_format):
+    digest = cart_hash(user)
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(pk=user.pk)
+             .values_list('pk', flat=True))
+        cutoff = timezone.now() - JOB_STALE_AFTER
+        jobs = ShoppingListJob.objects.filter(user=user, format=export_format)
+        job = jobs.filter(cart_hash=digest).first()
+        if job is not None and (
+                job.status == ShoppingListJob.DONE
+                or (job.status in ACTIVE_STATUSES
+                    and job.updated_at >= cutoff)):
+            return job
+        if job is None:
+            job = ShoppingListJob.objects.create(
+                user=user, format=export_format, cart_hash=digest)
+        else:
+            job.status = ShoppingListJob.PENDING
+            job.error = ''
+            job.finished_at = None
+            job.save()
+        stale = jobs.exclude(pk=job.pk).filter(
+            Q(status__in=[ShoppingListJob.DONE, ShoppingListJob.FAILED])
+            | Q(updated_at__lt=cutoff)
+        )
+        for old_job in stale:
+            old_job.file.delete(save=False)
+            old_job.delete()
+        transaction.on_commit(partial(submit, run_job, job.pk))
+    return job
+
+
+def run_job(job_id):
+    claimed = ShoppingListJob.objects.filter(
+        pk=job_id, status=ShoppingListJob.PENDING
+    ).update(status=ShoppingListJob.RUNNING, updated_at=timezone.now())
+    if not claimed:
+        return
+    job = ShoppingListJob.objects.select_related('user').get(pk=job_id)
+    try:
+        _, render = EXPORT_FORMATS[job.format]
+        digest = hashlib.sha256()
+        with tempfile.TemporaryFile() as output:
+            rows = _hashed(shopping_list_rows(job.user), digest)
+            for chunk in render(rows):
+                output.write(
+                    chunk.encode() if isinstance(chunk, str) else chunk)
+            if digest.hexdigest() != job.cart_hash:
+                raise ValueError('Список покупок изменился во время выгрузки')
+            output.seek(0)
+            job.file.save(
+                f'{job.pk}.{job.format}', File(output), save=False)
+        job.status = ShoppingListJob.DONE
+    except Exception as error:
+        logger.exception('Shopping list job %s failed', job_id)
+        job.status = ShoppingListJob.FAILED
+        job.error = str(error)
+    job.finished_at = timezone.now()
+    try:
+        job.save(force_update=True)
+    except DatabaseError:
+        job.file.delete(save=False)
@@ -0,0 +1,104 @@
+from functools import partial
+
+from django.db import connections, transaction
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_migrate
+)
+from django.dispatch import receiver
+
+from user_login.models import Follow, User
+from user_page.models import Favorite, Shoping
+from user_page.shopping_totals import drop_recipe
+from .cache import bump_generation
+from .images import release_image
+from .models import Ingredient, Recipe, RecipeIngredient
+from .pantry import REVISION_TRIGGER_SQL, pantry_index
+from .response_cache import invalidate_recipes
+
+AUTHOR_FIELDS = {'username', 'first_name', 'last_name', 'email', 'avatar'}
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_generation, 'recipes'))
+    transaction.on_commit(partial(invalidate_recipes, instance.pk))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    drop_recipe(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_recipes, instance.pk))
+    pantry_index.remove_recipe(instance.pk)
+    transaction.on_commit(partial(
+        release_image, instance.image.name, instance.image_variants))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_generation, 'recipes'))
+    transaction.on_commit(partial(invalidate_recipes, instance.recipe_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        transaction.on_commit(partial(bump_generation, 'users'))
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(partial(
+        invalidate_recipes, *instance.resipe.values_list('id', flat=True)))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    if instance.avatar:
+        transaction.on_commit(partial(
+            release_image, instance.avatar.name, instance.avatar_variants))
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=Shoping)
+@receiver(post_delete, sender=Shoping)
+def recipe_set_changed(sender, **kwargs):
+    transaction.on_commit(partial(bump_generation, 'recipes'))
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def user_set_changed(sender, **kwargs):
+    transaction.on_commit(partial(bump_generation, 'users'))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_catalog_changed(sender, **kwargs):
+    transaction.on_commit(partial(bump_generation, 'ingredients'))
+
+
+@receiver(pre_migrate)
+def create_postgres_extensions(sender, using, **kwargs):
+    connection = connections[using]
+    if sender.name == 'foodgram_app' and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+@receiver(post_migrate)
+def create_recipe_revision_trigger(sender, using, **kwargs):
+    connection = connections[using]
+    if sender.name == 'foodgram_app' and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(REVISION_TRIGGER_SQL)
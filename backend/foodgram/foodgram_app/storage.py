@@ -0,0 +1,69 @@
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+GRACE_PERIOD = 60 * 60
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(f'{BLOB_DIR}/')
+
+
+def blob_name(digest, ext):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        if is_blob(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        return blob_name(digest.hexdigest(), os.path.splitext(name)[1])
+
+    def _save(self, name, content):
+        if not is_blob(name):
+            name = self.hashed_name(name, content)
+        if self.exists(name):
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass
+        partial_name = super()._save(
+            f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(partial_name), self.path(name))
+        return name
+
+    def discard(self, name, cutoff):
+        path = self.path(name)
+        removed_path = f'{path}.{uuid.uuid4().hex}.removed'
+        try:
+            os.replace(path, removed_path)
+        except FileNotFoundError:
+            return False
+        if os.stat(removed_path).st_mtime > cutoff:
+            os.replace(removed_path, path)
+            return False
+        os.remove(removed_path)
+        return True
+
+
+content_storage = ContentAddressedStorage()
+
+
+def shopping_list_storage():
+    return FileSystemStorage(location=settings.SHOPPING_LIST_DIR)
@@ -0,0 +1,185 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from user_login.models import Follow
+from user_page.models import Favorite, Shoping
+from user_page.shopping_totals import ITEMS, PRUNE_SQL, RECIPE_INGREDIENTS
+
+ADD_SQL = '''
+    WITH target AS (
+        SELECT id FROM {target} WHERE id = %(target)s
+    ), changed AS (
+        INSERT INTO {relation} ({columns})
+        SELECT {values} FROM target
+        ON CONFLICT ({owner_column}, {target_column}) DO NOTHING
+        RETURNING {target_column} AS target_id
+    ), counted AS (
+        UPDATE {target} SET {counter} = {counter} + 1
+        WHERE id IN (SELECT target_id FROM changed)
+        RETURNING id
+    ){extra}
+    SELECT EXISTS (SELECT 1 FROM target), EXISTS (SELECT 1 FROM changed)
+'''
+
+REMOVE_SQL = '''
+    WITH target AS (
+        SELECT id FROM {target} WHERE id = %(target)s
+    ), changed AS (
+        DELETE FROM {relation}
+        WHERE {owner_column} = %(owner)s AND {target_column} = %(target)s
+        RETURNING {target_column} AS target_id
+    ), counted AS (
+        UPDATE {target} SET {counter} = {counter} - 1
+        WHERE id IN (SELECT target_id FROM changed) AND {counter} > 0
+        RETURNING id
+    ){extra}
+    SELECT EXISTS (SELECT 1 FROM target), EXISTS (SELECT 1 FROM changed)
+'''
+
+BATCH_ADD_SQL = '''
+    WITH changed AS (
+        INSERT INTO {relation} ({columns})
+        SELECT {values} FROM {target}
+        WHERE id = ANY(%(targets)s)
+        ORDER BY id
+        ON CONFLICT ({owner_column}, {target_column}) DO NOTHING
+        RETURNING {target_column} AS target_id
+    ), counted AS (
+        UPDATE {target} SET {counter} = {counter} + 1
+        WHERE id IN (SELECT target_id FROM changed)
+        RETURNING id
+    ){extra}
+    SELECT target_id FROM changed
+'''
+
+BATCH_REMOVE_SQL = '''
+    WITH changed AS (
+        DELETE FROM {relation}
+        WHERE {owner_column} = %(owner)s
+            AND {target_column} = ANY(%(targets)s)
+        RETURNING {target_column} AS target_id
+    ), counted AS (
+        UPDATE {target} SET {counter} = {counter} - 1
+        WHERE id IN (SELECT target_id FROM changed) AND {counter} > 0
+        RETURNING id
+    ){extra}
+    SELECT target_id FROM changed
+'''
+
+CHANGED_AMOUNTS_SQL = f'''
+        SELECT ingredient_id, SUM(amount) AS amount
+        FROM {RECIPE_INGREDIENTS}
+        WHERE recipe_id IN (SELECT target_id FROM changed)
+        GROUP BY ingredient_id
+'''
+
+CART_ADD_SQL = f''', totals AS (
+        INSERT INTO {ITEMS} (user_id, ingredient_id, total_amount)
+        SELECT %(owner)s, ingredient_id, amount FROM ({CHANGED_AMOUNTS_SQL})
+            AS amounts
+        ON CONFLICT (user_id, ingredient_id) DO UPDATE
+        SET total_amount = {ITEMS}.total_amount + EXCLUDED.total_amount
+        RETURNING id
+    )'''
+
+CART_REMOVE_SQL = f''', totals AS (
+        UPDATE {ITEMS} AS items
+        SET total_amount = items.total_amount - amounts.amount
+        FROM ({CHANGED_AMOUNTS_SQL}) AS amounts
+        WHERE items.user_id = %(owner)s
+            AND items.ingredient_id = amounts.ingredient_id
+        RETURNING items.id
+    )'''
+
+CART_CLEANUP_SQL = PRUNE_SQL.format(condition='user_id = %(owner)s')
+
+
+class RelationToggle:
+    def __init__(self, relation_model, owner_field, target_field,
+                 counter_field, add_extra='', remove_extra='',
+                 remove_cleanup=''):
+        opts = relation_model._meta
+        target_model = opts.get_field(target_field).related_model
+        owner_column = opts.get_field(owner_field).column
+        target_column = opts.get_field(target_field).column
+        self.timestamp_columns = [
+            field.column for field in opts.concrete_fields
+            if getattr(field, 'auto_now_add', False)
+        ]
+        sql_parts = {
+            'relation': opts.db_table,
+            'target': target_model._meta.db_table,
+            'owner_column': owner_column,
+            'target_column': target_column,
+            'counter': target_model._meta.get_field(counter_field).column,
+            'columns': ', '.join(
+                [owner_column, target_column, *self.timestamp_columns]),
+            'values': ', '.join(
+                ['%(owner)s', 'id']
+                + ['%(now)s'] * len(self.timestamp_columns)),
+        }
+        self.add_sql = ADD_SQL.format(extra=add_extra, **sql_parts)
+        self.remove_sql = REMOVE_SQL.format(extra=remove_extra, **sql_parts)
+        self.batch_add_sql = BATCH_ADD_SQL.format(
+            extra=add_extra, **sql_parts)
+        self.batch_remove_sql = BATCH_REMOVE_SQL.format(
+            extra=remove_extra, **sql_parts)
+        self.remove_cleanup_sql = remove_cleanup
+
+    def add(self, owner_id, target_id):
+        return self._execute(self.add_sql, {
+            'owner': owner_id,
+            'target': target_id,
+            'now': timezone.now(),
+        })
+
+    def remove(self, owner_id, target_id):
+        return self._remove(self._execute, self.remove_sql, {
+            'owner': owner_id,
+            'target': target_id,
+        })
+
+    def add_many(self, owner_id, target_ids):
+        return self._execute_many(self.batch_add_sql, {
+            'owner': owner_id,
+            'targets': list(target_ids),
+            'now': timezone.now(),
+        })
+
+    def remove_many(self, owner_id, target_ids):
+        return self._remove(self._execute_many, self.batch_remove_sql, {
+            'owner': owner_id,
+            'targets': list(target_ids),
+        })
+
+    def _remove(self, execute, sql, params):
+        if not self.remove_cleanup_sql:
+            return execute(sql, params)
+        with transaction.atomic():
+            result = execute(sql, params)
+            with connection.cursor() as cursor:
+                cursor.execute(self.remove_cleanup_sql, params)
+        return result
+
+    def _execute_many(self, sql, params):
+        if not params['targets']:
+            return set()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {target_id for target_id, in cursor.fetchall()}
+
+    def _execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            found, changed = cursor.fetchone()
+        return found, changed
+
+
+favorite_toggle = RelationToggle(
+    Favorite, 'user', 'recipe', 'favorites_count')
+cart_toggle = RelationToggle(
+    Shoping, 'user', 'recipe', 'in_carts_count',
+    add_extra=CART_ADD_SQL, remove_extra=CART_REMOVE_SQL,
+    remove_cleanup=CART_CLEANUP_SQL)
+follow_toggle = RelationToggle(
+    Follow, 'follower', 'author', 'followers_count')
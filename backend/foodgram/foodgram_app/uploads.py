@@ -0,0 +1,82 @@
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from rest_framework import serializers
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+
+from .models import ImageUpload
+
+UPLOAD_PREFIX = 'upload:'
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+IMAGE_PARSER_CLASSES = [JSONParser, MultiPartParser, FormParser]
+
+
+class UploadedImage(File):
+    def __init__(self, path, name):
+        super().__init__(open(path, 'rb'), name)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def upload_path(upload_id):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload_id}.part')
+
+
+def parse_content_range(header):
+    match = CONTENT_RANGE.match(header or '')
+    if match is None:
+        return None
+    start, end, total = map(int, match.groups())
+    if end < start or end >= total:
+        return None
+    return start, end, total
+
+
+def write_chunk(upload, stream, start, length):
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    path = upload_path(upload.pk)
+    written = 0
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+    with open(descriptor, 'wb') as target:
+        target.seek(start)
+        while stream is not None and written < length:
+            chunk = stream.read(min(STREAM_CHUNK_SIZE, length - written))
+            if not chunk:
+                break
+            target.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def resolve_upload(user, reference):
+    try:
+        upload_id = uuid.UUID(reference[len(UPLOAD_PREFIX):])
+    except ValueError:
+        raise serializers.ValidationError('Загрузка не найдена')
+    upload = None
+    if user is not None and user.is_authenticated:
+        upload = ImageUpload.objects.filter(user=user, pk=upload_id).first()
+    path = upload_path(upload_id)
+    if upload is None or not os.path.exists(path):
+        raise serializers.ValidationError('Загрузка не найдена')
+    if not upload.complete:
+        raise serializers.ValidationError('Загрузка ещё не завершена')
+    return UploadedImage(path, upload.filename)
+
+
+def close_image(image):
+    if isinstance(image, UploadedImage):
+        image.close()
+
+
+def discard_upload(upload):
+    path = upload_path(upload.pk)
+    if os.path.exists(path):
+        os.remove(path)
+    upload.delete()
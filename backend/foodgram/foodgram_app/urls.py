@@ -5,7 +5,15 @@ from .views import (
     RecipeShortLinkView,
     DownloadShoppingCartView,
     ShoppingCartView,
-    FavoriteView
+    FavoriteView,
+    FavoriteBatchView,
+    ShoppingCartBatchView,
+    ShoppingListJobView,
+    ShoppingListJobDownloadView,
+    ResponseCacheStatsView,
+    PantryMatchView,
+    ImageUploadView,
+    ImageUploadChunkView
 )
 
 app_name = 'foodgram_app'
@@ -18,7 +26,22 @@ urlpatterns = [
          name='short-link'),
     path('download_shopping_cart/',
          DownloadShoppingCartView.as_view(), name='download'),
+    path('shopping_list_jobs/<uuid:pk>/', ShoppingListJobView.as_view(),
+         name='shopping_list_job'),
+    path('shopping_list_jobs/<uuid:pk>/download/',
+         ShoppingListJobDownloadView.as_view(),
+         name='shopping_list_job_download'),
     path('<int:id>/shopping_cart/', ShoppingCartView.as_view(),
          name='shop_list'),
     path('<int:id>/favorite/', FavoriteView.as_view(), name='favorites_list'),
+    path('favorites/batch/', FavoriteBatchView.as_view(),
+         name='favorites_batch'),
+    path('shopping_cart/batch/', ShoppingCartBatchView.as_view(),
+         name='shop_list_batch'),
+    path('pantry/', PantryMatchView.as_view(), name='pantry'),
+    path('uploads/', ImageUploadView.as_view(), name='uploads'),
+    path('uploads/<uuid:pk>/', ImageUploadChunkView.as_view(),
+         name='upload_chunk'),
+    path('cache_stats/', ResponseCacheStatsView.as_view(),
+         name='cache_stats'),
 ]
@@ -1,26 +1,151 @@
 from rest_framework import generics, status, permissions, viewsets
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import Recipe, RecipeIngredient
-from user_page.models import Shoping, Favorite
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from .models import Recipe, RecipeIngredient, SEARCH_CONFIG
+from user_page.models import Shoping, Favorite, ShoppingListJob
+from user_login.models import Follow, User
 from .serializers import (
     RecipeListSerializer,
     RecipeCreateSerializer,
-    RecipeShortSerializer
+    RecipeShortSerializer,
+    PantryMatchSerializer,
+    ShoppingListJobSerializer,
+    ImageUploadSerializer
+)
+from .pantry import pantry_index
+from .shopping_list import (
+    EXPORT_FORMATS,
+    enqueue_job,
+    shopping_list_rows
+)
+from .counters import adjust_counter
+from .batch import BatchRelationView
+from .cache import bump_generation, get_generation
+from .toggles import cart_toggle, favorite_toggle
+from .uploads import (
+    IMAGE_PARSER_CLASSES,
+    discard_upload,
+    parse_content_range,
+    write_chunk
+)
+from django.db import transaction
+from .response_cache import (
+    is_cacheable,
+    recipe_list_key,
+    recipe_detail_key,
+    get_cached_response,
+    set_cached_response,
+    get_stats
+)
+from .conditional import (
+    build_etag,
+    recipe_version,
+    recipes_last_modified,
+    not_modified_response,
+    conditional_response
+)
+from .pagination import (
+    CustomPagination,
+    RecipeCursorPagination,
+    wants_cursor_pagination
 )
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from django.conf import settings
 from rest_framework.views import APIView
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.db.models import (
+    Exists, OuterRef, Value, Prefetch, F, Count
+)
+from rest_framework.exceptions import NotFound, ValidationError
+from django.contrib.postgres.search import SearchQuery, SearchRank
 
 
-class RecipeOneView(generics.RetrieveUpdateDestroyAPIView):
+def annotate_user_flags(queryset, user):
+    if not user.is_authenticated:
+        return queryset.annotate(
+            is_favorited=Value(False),
+            is_in_shopping_cart=Value(False),
+            is_author_subscribed=Value(False)
+        )
+    return queryset.annotate(
+        is_favorited=Exists(
+            Favorite.objects.filter(user=user, recipe=OuterRef('pk'))),
+        is_in_shopping_cart=Exists(
+            Shoping.objects.filter(user=user, recipe=OuterRef('pk'))),
+        is_author_subscribed=Exists(
+            Follow.objects.filter(follower=user, author=OuterRef('author')))
+    )
+
+
+def parse_id_list(params, name):
+    try:
+        return sorted({
+            int(item) for item in params[name].split(',') if item.strip()
+        })
+    except ValueError:
+        raise ValidationError(
+            {name: 'Ожидается список id ингредиентов через запятую'})
+
+
+def filter_by_ingredients(queryset, ingredient_ids, match_all):
+    recipe_ids = RecipeIngredient.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).values('recipe_id')
+    if match_all:
+        recipe_ids = recipe_ids.annotate(
+            matched=Count('ingredient_id')
+        ).filter(matched=len(ingredient_ids)).values('recipe_id')
+    return queryset.filter(id__in=recipe_ids)
+
+
+class RecipeReadQuerysetMixin:
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
+        return annotate_user_flags(queryset, self.request.user)
+
+
+class RecipeResponseMixin:
+    use_last_modified = True
+
+    def respond(self, cache_key, recipes, serialize, *etag_parts):
+        request = self.request
+        last_modified = None
+        if self.use_last_modified and not request.user.is_authenticated:
+            last_modified = recipes_last_modified(recipes)
+        etag = build_etag(
+            request.get_host(),
+            get_generation('ingredients'),
+            *etag_parts,
+            [recipe_version(recipe) for recipe in recipes]
+        )
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        entry = {
+            'data': serialize(),
+            'etag': etag,
+            'last_modified': last_modified
+        }
+        if cache_key is None:
+            return conditional_response(request, entry)
+        set_cached_response(cache_key, entry)
+        return conditional_response(request, entry, {'X-Cache': 'MISS'})
+
+
+class RecipeOneView(RecipeReadQuerysetMixin, RecipeResponseMixin,
+                    generics.RetrieveUpdateDestroyAPIView):
     queryset = Recipe.objects.all()
     serializer_class = RecipeListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    parser_classes = IMAGE_PARSER_CLASSES
     lookup_url_kwarg = 'id'
 
     def get_serializer_class(self):
@@ -28,9 +153,6 @@ class RecipeOneView(generics.RetrieveUpdateDestroyAPIView):
             return RecipeCreateSerializer
         return RecipeListSerializer
 
-    def get_queryset(self):
-        return super().get_queryset().select_related('author')
-
     def get_object(self):
         queryset = self.filter_queryset(self.get_queryset())
         obj = get_object_or_404(
@@ -38,6 +160,22 @@ class RecipeOneView(generics.RetrieveUpdateDestroyAPIView):
         self.check_object_permissions(self.request, obj)
         return obj
 
+    def retrieve(self, request, *args, **kwargs):
+        key = None
+        if is_cacheable(request):
+            key = recipe_detail_key(
+                request, self.kwargs[self.lookup_url_kwarg])
+            entry = get_cached_response(key)
+            if entry is not None:
+                return conditional_response(
+                    request, entry, {'X-Cache': 'HIT'})
+        instance = self.get_object()
+        return self.respond(
+            key,
+            [instance],
+            lambda: self.get_serializer(instance).data
+        )
+
     def check_object_permissions(self, request, obj):
         super().check_object_permissions(request, obj)
         if (request.method in ['PATCH', 'DELETE']
@@ -62,7 +200,7 @@ class RecipeOneView(generics.RetrieveUpdateDestroyAPIView):
         self.perform_update(update_serializer)
 
         response_serializer = RecipeListSerializer(
-            instance=recipe_instance,
+            instance=self.get_object(),
             context=self.get_serializer_context()
         )
 
@@ -74,7 +212,9 @@ class RecipeOneView(generics.RetrieveUpdateDestroyAPIView):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         try:
-            self.perform_destroy(instance)
+            with transaction.atomic():
+                self.perform_destroy(instance)
+                adjust_counter(User, instance.author_id, 'recipes_count', -1)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception:
             return Response(
@@ -118,37 +258,37 @@ class RecipeShortLinkView(viewsets.ViewSet):
             )
 
 
-class CustomPagination(PageNumberPagination):
-    page_size = 6
-    page_size_query_param = 'limit'
-    max_page_size = 100
-
-    def get_paginated_response(self, data):
-        return Response({
-            'count': self.page.paginator.count,
-            'next': self.get_next_link(),
-            'previous': self.get_previous_link(),
-            'results': data
-        })
-
-
-class RecipeView(generics.ListCreateAPIView):
+class RecipeView(RecipeReadQuerysetMixin, RecipeResponseMixin,
+                 generics.ListCreateAPIView):
     queryset = Recipe.objects.all().order_by('-id')
     pagination_class = CustomPagination
     permission_classes = [AllowAny]
+    parser_classes = IMAGE_PARSER_CLASSES
+    use_last_modified = False
+    count_strategy = 'estimate'
+    count_generation = 'recipes'
 
     def get_permissions(self):
         if self.request.method == "POST":
             return [IsAuthenticated()]
         return super().get_permissions()
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if wants_cursor_pagination(self.request):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_serializer_class(self):
         if self.request.method == "POST":
             return RecipeCreateSerializer
         return RecipeListSerializer
 
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('author')
+        queryset = super().get_queryset()
         params = self.request.GET
 
         if 'author' in params:
@@ -165,21 +305,50 @@ class RecipeView(generics.ListCreateAPIView):
                 queryset = queryset.filter(
                     shopping_carts__user=self.request.user)
 
+        if 'ingredients' in params:
+            ingredient_ids = parse_id_list(params, 'ingredients')
+            if ingredient_ids:
+                queryset = filter_by_ingredients(
+                    queryset, ingredient_ids, match_all=True)
+
+        if 'any_ingredients' in params:
+            ingredient_ids = parse_id_list(params, 'any_ingredients')
+            if ingredient_ids:
+                queryset = filter_by_ingredients(
+                    queryset, ingredient_ids, match_all=False)
+
+        if search := params.get('search', '').strip():
+            query = SearchQuery(
+                search, config=SEARCH_CONFIG, search_type='websearch')
+            queryset = queryset.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            ).order_by('-rank', '-id')
+
         return queryset
 
     def list(self, request, *args, **kwargs):
-        if limit := request.query_params.get('limit'):
-            try:
-                self.pagination_class.page_size = int(limit)
-            except (TypeError, ValueError):
-                pass
-
-        return super().list(request, *args, **kwargs)
+        key = None
+        if is_cacheable(request):
+            key = recipe_list_key(request)
+            entry = get_cached_response(key)
+            if entry is not None:
+                return conditional_response(
+                    request, entry, {'X-Cache': 'HIT'})
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()))
+        return self.respond(
+            key,
+            page,
+            lambda: self.get_paginated_response(
+                self.get_serializer(page, many=True).data).data,
+            request.get_full_path(),
+            self.paginator.get_page_version()
+        )
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        recipe = serializer.save()
+        recipe = super().get_queryset().get(pk=serializer.save().pk)
 
         response_serializer = RecipeListSerializer(
             recipe,
@@ -198,114 +367,216 @@ class RecipeView(generics.ListCreateAPIView):
             )
 
 
-class ShoppingCartView(generics.CreateAPIView, generics.DestroyAPIView):
-    permission_classes = [IsAuthenticated]
-    serializer_class = RecipeShortSerializer
-    lookup_url_kwarg = 'id'
+class PantryMatchView(APIView):
+    permission_classes = [AllowAny]
 
-    def create(self, request, *args, **kwargs):
-        user = request.user
-        recipe_id = self.kwargs.get(self.lookup_url_kwarg)
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        if recipe.shop_cart.filter(user=user).exists():
-            return Response(
-                {'detail': 'Рецепт уже есть в списке покупок'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        shopping_item = Shoping.objects.create(user=user, recipe=recipe)
+    def post(self, request):
+        serializer = PantryMatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        matches = pantry_index.match(
+            data['ingredients'], data['max_missing'], data['limit'])
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _, _ in matches])
 
-        serializer = self.get_serializer(recipe)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        results = []
+        for recipe_id, coverage, missing in matches:
+            if recipe_id not in recipes:
+                pantry_index.remove_recipe(recipe_id)
+                continue
+            item = RecipeShortSerializer(
+                recipes[recipe_id], context={'request': request}).data
+            item['coverage'] = round(coverage, 3)
+            item['missing_count'] = missing
+            results.append(item)
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
-    def destroy(self, request, *args, **kwargs):
-        user = request.user
-        recipe_id = self.kwargs.get(self.lookup_url_kwarg)
 
-        recipe = get_object_or_404(Recipe, id=recipe_id)
+class FavoriteBatchView(BatchRelationView):
+    toggle = favorite_toggle
+    target_model = Recipe
 
-        shopping_item = recipe.shop_cart.filter(user=user)
-        if not shopping_item:
-            return Response(
-                {'detail': 'Рецепта нет в списке покупок'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
 
-        shopping_item.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+class ShoppingCartBatchView(BatchRelationView):
+    toggle = cart_toggle
+    target_model = Recipe
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_stats())
 
 
-class FavoriteView(generics.CreateAPIView, generics.DestroyAPIView):
+class RecipeRelationView(generics.CreateAPIView, generics.DestroyAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = RecipeShortSerializer
     lookup_url_kwarg = 'id'
+    toggle = None
+    exists_message = None
+    missing_message = None
 
     def create(self, request, *args, **kwargs):
-        user = request.user
         recipe_id = self.kwargs.get(self.lookup_url_kwarg)
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-
-        if recipe.favorites.filter(user=user).exists():
+        found, created = self.toggle.add(request.user.id, recipe_id)
+        if not found:
+            raise NotFound()
+        if not created:
             return Response(
-                {'detail': 'Рецепт уже есть в избранном'},
+                {'detail': self.exists_message},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        Favorite.objects.create(user=user, recipe=recipe)
+        bump_generation('recipes')
 
-        serializer = self.get_serializer(recipe)
+        serializer = self.get_serializer(Recipe.objects.get(id=recipe_id))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def destroy(self, request, *args, **kwargs):
-        user = request.user
         recipe_id = self.kwargs.get(self.lookup_url_kwarg)
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        favorite = recipe.favorites.filter(user=user)
-
-        if not favorite:
+        found, deleted = self.toggle.remove(request.user.id, recipe_id)
+        if not found:
+            raise NotFound()
+        if not deleted:
             return Response(
-                {'detail': 'Рецепта нет в избранном'},
+                {'detail': self.missing_message},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        favorite.delete()
+        bump_generation('recipes')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class ShoppingCartView(RecipeRelationView):
+    toggle = cart_toggle
+    exists_message = 'Рецепт уже есть в списке покупок'
+    missing_message = 'Рецепта нет в списке покупок'
+
+
+class FavoriteView(RecipeRelationView):
+    toggle = favorite_toggle
+    exists_message = 'Рецепт уже есть в избранном'
+    missing_message = 'Рецепта нет в избранном'
+
+
 class DownloadShoppingCartView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, format=None):
-        shopping_items = Shoping.shop_cart.select_related('recipe')
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
 
-        if not shopping_items.exists():
+    def get(self, request, format=None):
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'detail': 'Поддерживаемые форматы: '
+                           + ', '.join(EXPORT_FORMATS)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not request.user.shop_cart.exists():
             return Response(
                 {'detail': 'Ваш список покупок пуст'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ingredient_data = (
-            RecipeIngredient.objects
-            .filter(recipe__shop_cart__user=request.user)
-            .select_related('ingredient')
-            .values(
-                'ingredient__name',
-                'ingredient__measurement_unit'
+        if request.query_params.get('async') == '1':
+            job = enqueue_job(request.user, export_format)
+            serializer = ShoppingListJobSerializer(
+                job, context={'request': request})
+            return Response(
+                serializer.data,
+                status=(status.HTTP_200_OK
+                        if job.status == ShoppingListJob.DONE
+                        else status.HTTP_202_ACCEPTED)
             )
-            .annotate(total_amount=Sum('amount'))
-            .order_by('ingredient__name')
+        content_type, render = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            render(shopping_list_rows(request.user)),
+            content_type=content_type
         )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{export_format}"')
+        return response
 
-        ingredients = {
-            (item['ingredient__name'],
-             item['ingredient__measurement_unit']): item['total_amount']
-            for item in ingredient_data
-        }
 
-        return self._generate_txt_file(ingredients)
+class ShoppingListJobView(generics.RetrieveAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = ShoppingListJobSerializer
 
-    def _generate_txt_file(self, ingredients):
-        content = "Список покупок:\n\n"
-        for (name, unit), amount in ingredients.items():
-            content += f"- {name}: {amount} {unit}\n"
+    def get_queryset(self):
+        return self.request.user.shopping_list_jobs.all()
 
-        response = HttpResponse(content, content_type='text/plain')
-        response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"')
-        return response
+
+class ShoppingListJobDownloadView(ShoppingListJobView):
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != ShoppingListJob.DONE:
+            return Response(
+                {'detail': 'Файл ещё не готов'},
+                status=status.HTTP_409_CONFLICT
+            )
+        content_type, _ = EXPORT_FORMATS[job.format]
+        return FileResponse(
+            job.file.open('rb'),
+            as_attachment=True,
+            filename=f'shopping_list.{job.format}',
+            content_type=content_type
+        )
+
+
+class ImageUploadView(generics.CreateAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = ImageUploadSerializer
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class ImageUploadChunkView(generics.RetrieveDestroyAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = ImageUploadSerializer
+
+    def get_queryset(self):
+        return self.request.user.image_uploads.all()
+
+    def put(self, request, *args, **kwargs):
+        content_range = parse_content_range(
+            request.headers.get('Content-Range'))
+        if content_range is None:
+            return Response(
+                {'detail': 'Некорректный заголовок Content-Range'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        start, end, total = content_range
+        length = end - start + 1
+        upload = get_object_or_404(self.get_queryset(), pk=kwargs['pk'])
+        if total != upload.size:
+            return Response(
+                {'detail': 'Размер файла не совпадает с заявленным'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start != upload.offset:
+            return self.offset_conflict(upload)
+        written = write_chunk(upload, request.stream, start, length)
+        updated = self.get_queryset().filter(
+            pk=upload.pk, offset=start).update(offset=start + written)
+        if not updated:
+            return self.offset_conflict(
+                get_object_or_404(self.get_queryset(), pk=upload.pk))
+        upload.offset = start + written
+        if written != length:
+            return Response(
+                {'detail': 'Получено меньше данных, чем указано '
+                           'в Content-Range',
+                 'offset': upload.offset},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(self.get_serializer(upload).data)
+
+    def offset_conflict(self, upload):
+        return Response(
+            {'detail': 'Фрагмент должен начинаться с текущего смещения',
+             'offset': upload.offset},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    def perform_destroy(self, instance):
+        discard_upload(instance)
@@ -0,0 +1,33 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.BACKGROUND_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(os.environ['DJANGO_SETTINGS_MODULE'],)
+                )
+    return _executor
+
+
+def submit(func, *args):
+    return get_executor().submit(func, *args)
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from foodgram_app.storage import content_storage
+
 MAX_LENGTH_TEXT = 150
 MAX_LENGTH_PASSWORD = 128
 MAX_LENGTH_EMAIL = 254
@@ -39,14 +41,28 @@ class User(AbstractUser):
     )
     avatar = models.ImageField(
         upload_to='static/users_avatars/',
+        storage=content_storage,
         null=True,
         blank=True,
+        db_index=True,
         verbose_name='Фото'
     )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии фото'
+    )
 
     first_name = models.CharField(max_length=MAX_LENGTH_TEXT)
     last_name = models.CharField(max_length=MAX_LENGTH_TEXT)
     password = models.CharField(max_length=MAX_LENGTH_PASSWORD)
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Дата изменения')
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Рецептов')
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписчиков')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -4,6 +4,7 @@ from django.core.exceptions import ValidationError
 from user_login.models import User
 from user_page.models import Recipe
 from django.db import IntegrityError
+from foodgram_app.images import variant_urls
 from django.core.validators import RegexValidator, MaxLengthValidator
 
 
@@ -53,7 +54,7 @@ class SubscribeSerializer(serializers.ModelSerializer):
         ).data
 
     def get_recipes_count(self, obj):
-        return obj.recipe.count()
+        return obj.recipes_count
 
     def get_avatar(self, obj):
         if obj.avatar:
@@ -90,7 +91,7 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
         return serializer.data
 
     def get_recipes_count(self, obj):
-        return obj.recipe.count()
+        return obj.recipes_count
 
     def get_is_subscribed(self, obj):
         return True
@@ -99,6 +100,7 @@ class UserWithRecipesSerializer(serializers.ModelSerializer):
 class UserReadSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -110,12 +112,15 @@ class UserReadSerializer(serializers.ModelSerializer):
             "last_name",
             "is_subscribed",
             "avatar",
+            "avatar_variants",
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get("request")
         if request and request.user.is_authenticated:
-            return request.user.following.filter(author=obj)
+            return request.user.follower.filter(author=obj).exists()
         return False
 
     def get_avatar(self, obj):
@@ -123,6 +128,10 @@ class UserReadSerializer(serializers.ModelSerializer):
             return obj.avatar.url
         return None
 
+    def get_avatar_variants(self, obj):
+        return variant_urls(
+            getattr(obj, 'avatar_variants', {}), self.context.get('request'))
+
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -6,7 +6,8 @@ from .views import (
     UserAvatarUploadView,
     UserViewSet,
     SubscriptionsView,
-    SubscribeView
+    SubscribeView,
+    SubscribeBatchView
 )
 
 app_name = 'user_login'
@@ -19,6 +20,8 @@ urlpatterns = [
     path('auth/token/logout/', LogoutViewSet.as_view(), name="logout"),
     path('me/', UserViewSet.as_view({'get': 'me'}), name="me"),
     path('me/avatar/', UserAvatarUploadView.as_view(), name='user-avatar'),
+    path('subscriptions/batch/', SubscribeBatchView.as_view(),
+         name='subscribe_batch'),
     path('subscriptions/', SubscriptionsView.as_view(), name='subscriptions'),
     path('<int:id>/subscribe/', SubscribeView.as_view(), name='subscribe'),
 ]
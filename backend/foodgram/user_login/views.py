@@ -1,12 +1,11 @@
-import base64
-import uuid
-from django.core.files.base import ContentFile
+from functools import partial
+
 from rest_framework.exceptions import NotAuthenticated
 from django.contrib.auth import logout as auth_logout
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.password_validation import validate_password
 from django.shortcuts import get_object_or_404
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework import status, viewsets, mixins
 from rest_framework.permissions import (
     AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly)
@@ -14,7 +13,25 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
+from foodgram_app.pagination import CountStrategyMixin
 from .models import User, Follow
+from django.db.models import Exists, OuterRef
+from django.db import transaction
+from foodgram_app.batch import BatchRelationView
+from foodgram_app.cache import bump_generation
+from foodgram_app.images import (
+    generate_avatar_variants,
+    release_image,
+    schedule_variants
+)
+from foodgram_app.serializers import AvatarUploadSerializer
+from foodgram_app.toggles import follow_toggle
+from foodgram_app.uploads import IMAGE_PARSER_CLASSES, close_image
+from foodgram_app.conditional import (
+    build_etag,
+    not_modified_response,
+    set_validators
+)
 from rest_framework.generics import RetrieveAPIView, ListCreateAPIView
 from rest_framework import generics
 from .serializers import (
@@ -25,7 +42,7 @@ from .serializers import (
 )
 
 
-class UserPagination(PageNumberPagination):
+class UserPagination(CountStrategyMixin, PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 100
@@ -41,13 +58,35 @@ class UserViewSet(
 
     def retrieve(self, request, id, *args, **kwargs):
         try:
-            user = get_object_or_404(User, id=id)
+            queryset = User.objects.all()
+            last_modified = None
+            if request.user.is_authenticated:
+                queryset = queryset.annotate(is_subscribed=Exists(
+                    Follow.objects.filter(
+                        follower=request.user, author=OuterRef('pk'))
+                ))
+            user = get_object_or_404(queryset, id=id)
+
+            etag = build_etag(
+                user.pk,
+                user.updated_at.timestamp(),
+                getattr(user, 'is_subscribed', None)
+            )
+            if not request.user.is_authenticated:
+                last_modified = user.updated_at
+            not_modified = not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
 
             context = {'request': request}
 
             serializer = UserReadSerializer(user, context=context)
 
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return set_validators(
+                Response(serializer.data, status=status.HTTP_200_OK),
+                etag,
+                last_modified
+            )
 
         except Exception as e:
             return Response(
@@ -67,6 +106,8 @@ class UserListCreateView(ListCreateAPIView):
     queryset = User.objects.all()
     pagination_class = UserPagination
     permission_classes = [IsAuthenticatedOrReadOnly]
+    count_strategy = 'estimate'
+    count_generation = 'users'
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -145,49 +186,39 @@ class PasswordChangeView(APIView):
 
 class UserAvatarUploadView(APIView):
     permission_classes = [IsAuthenticated]
+    parser_classes = IMAGE_PARSER_CLASSES
 
     def put(self, request, *args, **kwargs):
-        avatar_data = request.data.get('avatar')
-
-        if not avatar_data:
+        serializer = AvatarUploadSerializer(
+            data=request.data, context={'request': request})
+        if not serializer.is_valid():
             return Response(
-                {"avatar": ["This field is required."]},
+                serializer.errors,
                 status=status.HTTP_400_BAD_REQUEST
             )
+        data = serializer.validated_data['avatar']
 
-        try:
-            format, imgstr = avatar_data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            filename = f"{uuid.uuid4()}.{ext}"
-            data = ContentFile(base64.b64decode(imgstr), name=filename)
-
-            user = request.user
-            if user.avatar:
-                user.avatar.delete(save=False)
-
-            user.avatar.save(filename, data, save=True)
-
-            avatar_url = request.build_absolute_uri(user.avatar.url)
-            return Response({"avatar": avatar_url}, status=status.HTTP_200_OK)
+        user = request.user
+        with transaction.atomic():
+            schedule_variants(
+                generate_avatar_variants, user.pk,
+                user.avatar.name, user.avatar_variants)
+            user.avatar_variants = {}
+            user.avatar.save(data.name, data, save=True)
+        close_image(data)
 
-        except (ValueError, TypeError, AttributeError):
-            return Response(
-                {"avatar": ["Invalid base64 format."]},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        except Exception as e:
-            return Response(
-                {"detail": str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        avatar_url = request.build_absolute_uri(user.avatar.url)
+        return Response({"avatar": avatar_url}, status=status.HTTP_200_OK)
 
     def delete(self, request, *args, **kwargs):
         user = request.user
         if user.avatar:
-            user.avatar.delete()
+            old_name, old_variants = user.avatar.name, user.avatar_variants
             user.avatar = None
+            user.avatar_variants = {}
             user.save()
+            transaction.on_commit(
+                partial(release_image, old_name, old_variants))
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {"detail": "Аватар не найден."},
@@ -209,15 +240,17 @@ class SubscribeView(generics.CreateAPIView, generics.DestroyAPIView):
                 code=status.HTTP_400_BAD_REQUEST
             )
 
-        author = get_object_or_404(User, id=author_id)
-
-        if user.follower.filter(author=author):
+        found, created = follow_toggle.add(user.id, author_id)
+        if not found:
+            raise NotFound()
+        if not created:
             raise ValidationError(
                 {'detail': 'Вы уже подписаны на этого пользователя'},
                 code=status.HTTP_400_BAD_REQUEST
             )
+        bump_generation('users')
 
-        Follow.objects.create(follower=user, author=author)
+        author = User.objects.get(id=author_id)
         serializer = self.get_serializer(author, context={
             'request': request,
             'recipes_limit': request.query_params.get('recipes_limit')
@@ -225,22 +258,28 @@ class SubscribeView(generics.CreateAPIView, generics.DestroyAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def destroy(self, request, id):
-        user = request.user
-
-        author = get_object_or_404(User, id=id)
-
-        follow = user.follower.filter(author=author)
-        if not follow:
+        found, deleted = follow_toggle.remove(request.user.id, id)
+        if not found:
+            raise NotFound()
+        if not deleted:
             return Response(
                 {'detail': 'Вы не подписаны на этого пользователя'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        follow.delete()
+        bump_generation('users')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class SubscriptionsPagination(PageNumberPagination):
+class SubscribeBatchView(BatchRelationView):
+    toggle = follow_toggle
+    target_model = User
+    generation = 'users'
+
+    def reject(self, user, pk):
+        return 'self' if pk == user.pk else None
+
+
+class SubscriptionsPagination(CountStrategyMixin, PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 100
@@ -258,6 +297,8 @@ class SubscriptionsView(generics.ListAPIView):
     serializer_class = UserWithRecipesSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = SubscriptionsPagination
+    count_strategy = 'cached'
+    count_generation = 'users'
 
     def get_queryset(self):
         subscribed_users = self.request.user.follower.all()
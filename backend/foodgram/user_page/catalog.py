@@ -0,0 +1,58 @@
+import gzip
+import json
+import threading
+
+from django.core.cache import cache
+
+from foodgram_app.cache import get_generation
+from foodgram_app.conditional import build_etag
+from foodgram_app.models import Ingredient
+
+CATALOG_CACHE_KEY = 'ingredient_catalog:{}'
+CATALOG_CACHE_TIMEOUT = 86400
+
+
+class IngredientCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    @property
+    def version(self):
+        return str(get_generation('ingredients'))
+
+    def get(self):
+        version = self.version
+        snapshot = self._snapshot
+        if snapshot is None or snapshot['version'] != version:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot['version'] != version:
+                    snapshot = self._load(version)
+                    self._snapshot = snapshot
+        return snapshot
+
+    def _load(self, version):
+        key = CATALOG_CACHE_KEY.format(version)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = self._build(version)
+            cache.set(key, snapshot, CATALOG_CACHE_TIMEOUT)
+        return snapshot
+
+    def _build(self, version):
+        rows = list(
+            Ingredient.objects.order_by('name').values(
+                'id', 'name', 'measurement_unit')
+        )
+        body = json.dumps(
+            rows, ensure_ascii=False, separators=(',', ':')).encode()
+        return {
+            'version': version,
+            'etag': build_etag('catalog', version),
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+        }
+
+
+ingredient_catalog = IngredientCatalog()
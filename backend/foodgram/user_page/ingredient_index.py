@@ -0,0 +1,67 @@
+import bisect
+import heapq
+import threading
+import time
+
+from django.db.models import Count
+
+from foodgram_app.cache import get_generation
+from foodgram_app.models import Ingredient
+
+POPULARITY_TTL = 600
+
+
+class IngredientPrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = ([], [])
+        self._version = None
+        self._built_at = 0
+
+    def search(self, prefix, limit=None):
+        keys, entries = self._snapshot()
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + '\U0010ffff', start)
+        matches = entries[start:end]
+        if limit:
+            matches = heapq.nsmallest(limit, matches, key=_by_popularity)
+        else:
+            matches = sorted(matches, key=_by_popularity)
+        return [data for _, data in matches]
+
+    def _snapshot(self):
+        version = get_generation('ingredients')
+        if (version != self._version
+                or time.monotonic() - self._built_at > POPULARITY_TTL):
+            with self._lock:
+                if (version != self._version or time.monotonic()
+                        - self._built_at > POPULARITY_TTL):
+                    self._rebuild(version)
+        return self._index
+
+    def _rebuild(self, version):
+        rows = Ingredient.objects.annotate(
+            popularity=Count('recipeingredient')
+        ).values_list('id', 'name', 'measurement_unit', 'popularity')
+        entries = sorted(
+            (name.casefold(), pk, popularity, {
+                'id': pk,
+                'name': name,
+                'measurement_unit': measurement_unit,
+            })
+            for pk, name, measurement_unit, popularity in rows
+        )
+        self._index = (
+            [key for key, _, _, _ in entries],
+            [(popularity, data) for _, _, popularity, data in entries]
+        )
+        self._version = version
+        self._built_at = time.monotonic()
+
+
+def _by_popularity(entry):
+    return -entry[0]
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,131 @@
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from foodgram_app.models import Ingredient
+from foodgram_app.seed import DATA_DIR, read_records
+from user_page.views import SIMILARITY_THRESHOLD_SQL, IngredientView
+
+BATCH_SIZE = 5000
+QUERIES = [
+    ('префикс', 'абрикос'),
+    ('опечатка', 'абрикас'),
+    ('опечатка', 'картофил'),
+    ('подстрока', 'варенье'),
+    ('короткий', 'мук'),
+]
+TRIGRAM_INDEX = 'ingredient_name_trgm_idx'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет нечёткий поиск ингредиентов на справочнике, '
+        'увеличенном в заданное число раз'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(DATA_DIR, 'ingredients.json'),
+            help='Файл справочника ингредиентов'
+        )
+        parser.add_argument(
+            '--scale',
+            type=int,
+            default=100,
+            help='Во сколько раз увеличить справочник'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=50,
+            help='Число повторов каждого запроса'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Ограничение выдачи, как в параметре limit'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Нечёткий поиск работает только в PostgreSQL')
+        records = read_records(options['path'])
+        with transaction.atomic():
+            rows = self.fill(records, options['scale'])
+            self.stdout.write(f'Ингредиентов в справочнике: {rows}')
+            for label, term in QUERIES:
+                self.report(label, term, options['runs'], options['limit'])
+            transaction.set_rollback(True)
+
+    def fill(self, records, scale):
+        existing = set(Ingredient.objects.values_list('name', flat=True))
+        names = [item['name'].strip().lower() for item in records]
+        ingredients = (
+            Ingredient(
+                name=f'{name} {copy}' if copy else name,
+                measurement_unit=item['measurement_unit']
+            )
+            for copy in range(scale)
+            for name, item in zip(names, records)
+        )
+        batch = []
+        for ingredient in ingredients:
+            if ingredient.name in existing:
+                continue
+            existing.add(ingredient.name)
+            batch.append(ingredient)
+            if len(batch) == BATCH_SIZE:
+                Ingredient.objects.bulk_create(batch)
+                batch = []
+        Ingredient.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Ingredient._meta.db_table}')
+        return Ingredient.objects.count()
+
+    def report(self, label, term, runs, limit):
+        view = IngredientView()
+        prefix = Ingredient.objects.filter(
+            name__istartswith=term).order_by('name')[:limit]
+        prefix_times, prefix_found = self.measure(
+            lambda: list(prefix.all()), runs)
+        fuzzy_times, fuzzy_found = self.measure(
+            lambda: list(view.get_fuzzy_queryset(term, limit)), runs)
+        indexed = self.uses_index(view, term, limit)
+        self.stdout.write(
+            f'{label} «{term}»: '
+            f'префиксный фильтр {self.summary(prefix_times)} '
+            f'({len(prefix_found)} шт.), '
+            f'нечёткий поиск {self.summary(fuzzy_times)} '
+            f'({len(fuzzy_found)} шт., '
+            f'индекс: {"да" if indexed else "нет"}); '
+            f'первые: {", ".join(item.name for item in fuzzy_found[:3])}')
+
+    def measure(self, query, runs):
+        result = query()
+        times = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            result = query()
+            times.append((time.perf_counter() - started) * 1000)
+        return times, result
+
+    def summary(self, times):
+        times = sorted(times)
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        return f'медиана {statistics.median(times):.2f} мс, p95 {p95:.2f} мс'
+
+    def uses_index(self, view, term, limit):
+        raw = view.get_fuzzy_queryset(term, limit)
+        threshold, *params = raw.params
+        with connection.cursor() as cursor:
+            cursor.execute(SIMILARITY_THRESHOLD_SQL, [threshold])
+            cursor.execute(
+                'EXPLAIN ' + raw.raw_query[len(SIMILARITY_THRESHOLD_SQL):],
+                params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        return TRIGRAM_INDEX in plan
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodgram_app.models import DataLoad
+from user_page.shopping_totals import find_mismatches, rebuild
+
+REPORT_LIMIT = 20
+BACKFILL_SOURCE = 'shopping_totals'
+BACKFILL_VERSION = '1'
+
+
+class Command(BaseCommand):
+    help = 'Сверяет списки покупок пользователей с содержимым корзин'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Пересобрать списки покупок для расхождений'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Один раз пересобрать все списки покупок без сверки'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            return self.backfill()
+        mismatches = find_mismatches()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
+            return
+        for user_id, ingredient_id, expected, actual in (
+                mismatches[:REPORT_LIMIT]):
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидается {expected}, записано {actual}')
+        self.stdout.write(self.style.WARNING(
+            f'Найдено расхождений: {len(mismatches)}'))
+        if options['fix']:
+            user_ids = {user_id for user_id, *_ in mismatches}
+            with transaction.atomic():
+                rows = rebuild(user_ids)
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересобрано позиций: {rows}'))
+
+    def backfill(self):
+        if DataLoad.objects.filter(
+                source=BACKFILL_SOURCE, checksum=BACKFILL_VERSION).exists():
+            self.stdout.write('Списки покупок уже пересобраны')
+            return
+        with transaction.atomic():
+            rows = rebuild()
+            DataLoad.objects.update_or_create(
+                source=BACKFILL_SOURCE,
+                defaults={'checksum': BACKFILL_VERSION})
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано позиций: {rows}'))
@@ -1,6 +1,9 @@
+import uuid
+
 from django.db import models
 from user_login.models import User
-from foodgram_app.models import Recipe
+from foodgram_app.models import Ingredient, Recipe
+from foodgram_app.storage import shopping_list_storage
 
 
 class Shoping(models.Model):
@@ -66,3 +69,110 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в избранное'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.IntegerField(
+        default=0,
+        verbose_name='Общее количество'
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} x {self.total_amount}'
+
+
+class ShoppingListJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_jobs',
+        verbose_name='Пользователь'
+    )
+    format = models.CharField(
+        max_length=10,
+        verbose_name='Формат'
+    )
+    cart_hash = models.CharField(
+        max_length=64,
+        verbose_name='Хеш содержимого корзины'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    file = models.FileField(
+        storage=shopping_list_storage,
+        blank=True,
+        verbose_name='Файл'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения'
+    )
+
+    class Meta:
+        verbose_name = 'Задача списка покупок'
+        verbose_name_plural = 'Задачи списка покупок'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['user', 'format', 'cart_hash'],
+                name='shopping_job_lookup_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.format} ({self.status})'
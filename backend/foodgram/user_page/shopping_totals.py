@@ -0,0 +1,143 @@
+from django.db import connection
+
+from foodgram_app.models import RecipeIngredient
+from .models import Shoping, ShoppingListItem
+
+ITEMS = ShoppingListItem._meta.db_table
+CARTS = Shoping._meta.db_table
+RECIPE_INGREDIENTS = RecipeIngredient._meta.db_table
+
+UPSERT_SQL = f'''
+    INSERT INTO {ITEMS} (user_id, ingredient_id, total_amount)
+    {{source}}
+    ON CONFLICT (user_id, ingredient_id) DO UPDATE
+    SET total_amount = {ITEMS}.total_amount + EXCLUDED.total_amount
+'''
+
+PRUNE_SQL = f'''
+    DELETE FROM {ITEMS}
+    WHERE total_amount <= 0 AND {{condition}}
+'''
+
+CART_TOTALS_SQL = f'''
+    SELECT carts.user_id, ri.ingredient_id, {{sign}}SUM(ri.amount)
+    FROM {CARTS} AS carts
+    JOIN {RECIPE_INGREDIENTS} AS ri ON ri.recipe_id = carts.recipe_id
+    {{condition}}
+    GROUP BY carts.user_id, ri.ingredient_id
+'''
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _apply_recipes(user_id, recipe_ids, sign):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    _execute(
+        UPSERT_SQL.format(source=f'''
+            SELECT %s, ingredient_id, %s * SUM(amount)
+            FROM {RECIPE_INGREDIENTS}
+            WHERE recipe_id IN ({_placeholders(recipe_ids)})
+            GROUP BY ingredient_id
+        '''),
+        [user_id, sign, *recipe_ids]
+    )
+    if sign < 0:
+        _execute(PRUNE_SQL.format(condition='user_id = %s'), [user_id])
+
+
+def add_recipes(user_id, recipe_ids):
+    _apply_recipes(user_id, recipe_ids, 1)
+
+
+def remove_recipes(user_id, recipe_ids):
+    _apply_recipes(user_id, recipe_ids, -1)
+
+
+def apply_recipe_change(recipe_id, old_amounts, new_amounts):
+    deltas = [
+        (ingredient_id,
+         new_amounts.get(ingredient_id, 0) - old_amounts.get(ingredient_id, 0))
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+    ]
+    deltas = [delta for delta in deltas if delta[1]]
+    if not deltas:
+        return
+    _execute(
+        UPSERT_SQL.format(source=f'''
+            SELECT carts.user_id, delta.column1, delta.column2
+            FROM {CARTS} AS carts
+            CROSS JOIN (VALUES {', '.join(['(%s, %s)'] * len(deltas))})
+                AS delta
+            WHERE carts.recipe_id = %s
+        '''),
+        [value for delta in deltas for value in delta] + [recipe_id]
+    )
+    if any(amount < 0 for _, amount in deltas):
+        _prune_recipe_holders(recipe_id)
+
+
+def drop_recipe(recipe_id):
+    _execute(
+        UPSERT_SQL.format(source=CART_TOTALS_SQL.format(
+            sign='-', condition='WHERE carts.recipe_id = %s')),
+        [recipe_id]
+    )
+    _prune_recipe_holders(recipe_id)
+
+
+def _prune_recipe_holders(recipe_id):
+    _execute(
+        PRUNE_SQL.format(condition=(
+            f'user_id IN (SELECT user_id FROM {CARTS} '
+            f'WHERE recipe_id = %s)')),
+        [recipe_id]
+    )
+
+
+def find_mismatches():
+    with connection.cursor() as cursor:
+        cursor.execute(CART_TOTALS_SQL.format(sign='', condition=''))
+        expected = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in cursor.fetchall()
+        }
+    actual = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in ShoppingListItem.objects
+        .values_list('user_id', 'ingredient_id', 'total_amount')
+        .iterator()
+    }
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys()):
+        if expected.get(key, 0) != actual.get(key, 0):
+            mismatches.append((*key, expected.get(key, 0), actual.get(key, 0)))
+    return mismatches
+
+
+def rebuild(user_ids=None):
+    items = ShoppingListItem.objects.all()
+    condition, params = '', []
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
+        items = items.filter(user_id__in=user_ids)
+        condition = f'WHERE carts.user_id IN ({_placeholders(user_ids)})'
+        params = user_ids
+    items.delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ITEMS} (user_id, ingredient_id, total_amount) '
+            + CART_TOTALS_SQL.format(sign='', condition=condition),
+            params
+        )
+        return cursor.rowcount
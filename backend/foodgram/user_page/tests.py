@@ -1,3 +1,150 @@
-from django.test import TestCase
+import threading
+import unittest
 
-# Create your tests here.
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from foodgram_app.models import Ingredient, Recipe, RecipeIngredient
+from user_login.models import Follow, User
+from .models import Favorite, Shoping, ShoppingListItem
+from .shopping_totals import find_mismatches
+
+THREADS = 8
+ROUNDS = 10
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql', 'Переключатели используют PostgreSQL')
+class RelationToggleConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass',
+            first_name='Покупатель', last_name='Тестовый')
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+            first_name='Автор', last_name='Тестовый')
+        flour = Ingredient.objects.create(
+            name='мука', measurement_unit='г')
+        milk = Ingredient.objects.create(
+            name='молоко', measurement_unit='мл')
+        self.recipes = []
+        for index, amounts in enumerate([(200, 100), (300, 50), (150, 0)]):
+            recipe = Recipe.objects.create(
+                author=self.author, name=f'Рецепт {index}', image='test.png',
+                text='Описание', cooking_time=10)
+            for ingredient, amount in zip((flour, milk), amounts):
+                if amount:
+                    RecipeIngredient.objects.create(
+                        recipe=recipe, ingredient=ingredient, amount=amount)
+            self.recipes.append(recipe)
+
+    def hammer(self, *requests):
+        barrier = threading.Barrier(THREADS)
+        errors = []
+
+        def worker(request):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                for _ in range(ROUNDS):
+                    response = request(client)
+                    if response.status_code >= 500:
+                        errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(
+                target=worker, args=(requests[index % len(requests)],))
+            for index in range(THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assert_recipe_counters(self):
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                recipe.favorites_count,
+                Favorite.objects.filter(recipe=recipe).count())
+            self.assertEqual(
+                recipe.in_carts_count,
+                Shoping.objects.filter(recipe=recipe).count())
+
+    def test_parallel_favorite_adds_create_one_row(self):
+        recipe = self.recipes[0]
+        self.hammer(
+            lambda client: client.post(f'/api/recipes/{recipe.id}/favorite/'))
+        self.assertEqual(Favorite.objects.filter(recipe=recipe).count(), 1)
+        self.assert_recipe_counters()
+
+    def test_parallel_favorite_toggles(self):
+        recipe = self.recipes[0]
+        ids = [recipe.id for recipe in self.recipes]
+        self.hammer(
+            lambda client: client.post(f'/api/recipes/{recipe.id}/favorite/'),
+            lambda client: client.delete(
+                f'/api/recipes/{recipe.id}/favorite/'),
+            lambda client: client.post(
+                '/api/recipes/favorites/batch/', {'ids': ids},
+                format='json'),
+            lambda client: client.delete(
+                '/api/recipes/favorites/batch/', {'ids': ids},
+                format='json'),
+        )
+        self.assert_recipe_counters()
+
+    def test_parallel_cart_toggles(self):
+        first, second = self.recipes[0], self.recipes[1]
+        ids = [recipe.id for recipe in self.recipes]
+        self.hammer(
+            lambda client: client.post(
+                f'/api/recipes/{first.id}/shopping_cart/'),
+            lambda client: client.delete(
+                f'/api/recipes/{first.id}/shopping_cart/'),
+            lambda client: client.post(
+                f'/api/recipes/{second.id}/shopping_cart/'),
+            lambda client: client.delete(
+                f'/api/recipes/{second.id}/shopping_cart/'),
+            lambda client: client.post(
+                '/api/recipes/shopping_cart/batch/', {'ids': ids},
+                format='json'),
+            lambda client: client.delete(
+                '/api/recipes/shopping_cart/batch/', {'ids': ids},
+                format='json'),
+        )
+        self.assertEqual(find_mismatches(), [])
+        self.assertFalse(
+            ShoppingListItem.objects.filter(total_amount__lte=0).exists())
+        self.assert_recipe_counters()
+
+    def test_emptied_cart_leaves_no_totals(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        ids = [recipe.id for recipe in self.recipes]
+        client.post(
+            '/api/recipes/shopping_cart/batch/', {'ids': ids}, format='json')
+        client.delete(f'/api/recipes/{ids[0]}/shopping_cart/')
+        client.delete(
+            '/api/recipes/shopping_cart/batch/', {'ids': ids}, format='json')
+        self.assertFalse(
+            ShoppingListItem.objects.filter(user=self.user).exists())
+
+    def test_parallel_follow_toggles(self):
+        author = self.author
+        self.hammer(
+            lambda client: client.post(f'/api/users/{author.id}/subscribe/'),
+            lambda client: client.delete(
+                f'/api/users/{author.id}/subscribe/'),
+            lambda client: client.post(
+                '/api/users/subscriptions/batch/', {'ids': [author.id]},
+                format='json'),
+        )
+        author.refresh_from_db()
+        self.assertEqual(
+            author.followers_count,
+            Follow.objects.filter(author=author).count())
@@ -1,9 +1,15 @@
 from django.urls import path
-from .views import IngredientView, IngredientDetailView
+from .views import (
+    IngredientCatalogVersionView,
+    IngredientDetailView,
+    IngredientView
+)
 
 app_name = 'user_page'
 
 urlpatterns = [
+    path('version/', IngredientCatalogVersionView.as_view(),
+         name='IngredientCatalogVersionView'),
     path('<int:pk>/', IngredientDetailView.as_view(),
          name='IngredientDetailView'),
     path('', IngredientView.as_view(), name='IngredientView'),
@@ -1,8 +1,30 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework import generics
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from foodgram_app.cache import get_generation
+from foodgram_app.conditional import (
+    build_etag,
+    not_modified_response,
+    set_validators
+)
 from foodgram_app.models import Ingredient
+from .catalog import ingredient_catalog
+from .ingredient_index import ingredient_index
 from .serializers import IngredientSerializer
 
+CATALOG_MAX_AGE = 31536000
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+SIMILARITY_THRESHOLD_SQL = (
+    "SELECT set_config('pg_trgm.similarity_threshold', %s, true);")
+
 
 class IngredientView(generics.ListAPIView):
     serializer_class = IngredientSerializer
@@ -10,16 +32,103 @@ class IngredientView(generics.ListAPIView):
     pagination_class = None
 
     def get_queryset(self):
-        queryset = Ingredient.objects.all()
-        name = self.request.query_params.get('name')
+        queryset = Ingredient.objects.order_by('name')
+        limit = self.get_limit()
+
+        if limit:
+            queryset = queryset[:limit]
 
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        fuzzy = request.query_params.get('fuzzy') == '1'
+        limit = self.get_limit()
+        if not name and not limit:
+            return self.catalog_response(request)
+        etag = build_etag(get_generation('ingredients'), name, fuzzy, limit)
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        if name and fuzzy:
+            serializer = self.get_serializer(
+                self.get_fuzzy_queryset(name, limit), many=True)
+            return set_validators(Response(serializer.data), etag)
         if name:
-            queryset = queryset.filter(name__istartswith=name)
+            return set_validators(
+                Response(ingredient_index.search(name, limit)), etag)
+        return set_validators(super().list(request, *args, **kwargs), etag)
+
+    def catalog_response(self, request):
+        catalog = ingredient_catalog.get()
+        response = not_modified_response(request, catalog['etag'])
+        if response is None:
+            accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+            if ACCEPTS_GZIP.search(accept_encoding):
+                response = HttpResponse(
+                    catalog['gzip'], content_type='application/json')
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(
+                    catalog['identity'], content_type='application/json')
+            set_validators(response, catalog['etag'])
+        response['X-Catalog-Version'] = catalog['version']
+        patch_vary_headers(response, ['Accept-Encoding'])
+        if request.query_params.get('v') == catalog['version']:
+            patch_cache_control(
+                response, public=True, max_age=CATALOG_MAX_AGE,
+                immutable=True)
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    def get_fuzzy_queryset(self, name, limit):
+        threshold = settings.INGREDIENT_SIMILARITY_THRESHOLD
+        queryset = Ingredient.objects.annotate(
+            similarity=TrigramSimilarity('name', name),
+            match_rank=Case(
+                When(name__istartswith=name, then=Value(0)),
+                When(similarity__gte=threshold, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField()
+            )
+        ).filter(
+            Q(name__istartswith=name)
+            | Q(name__trigram_similar=name)
+            | Q(name__icontains=name)
+        ).order_by('match_rank', '-similarity', 'name')
+        if limit:
+            queryset = queryset[:limit]
+        sql, params = queryset.query.sql_with_params()
+        return Ingredient.objects.raw(
+            f'{SIMILARITY_THRESHOLD_SQL} {sql}', [str(threshold), *params])
 
-        return queryset.order_by('name')
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', 0))
+        except ValueError:
+            return None
+        return limit if limit > 0 else None
 
 
 class IngredientDetailView(generics.RetrieveAPIView):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = build_etag(get_generation('ingredients'), self.kwargs['pk'])
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(
+            super().retrieve(request, *args, **kwargs), etag)
+
+
+class IngredientCatalogVersionView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        response = Response({'version': ingredient_catalog.version})
+        patch_cache_control(response, no_cache=True)
+        return response